@@ -0,0 +1,67 @@
+"""
+Compare two benchmarks.load_test result files scenario by scenario.
+
+Prints throughput and p50/p95/p99 for both runs with the relative change, and exits
+with status 1 when any scenario's p95 grew (or throughput dropped) by more than
+--threshold percent, so it can gate a change in CI.
+
+    python -m benchmarks.compare before.json after.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+METRICS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def change(before: float, after: float) -> float:
+    if not before:
+        return 0.0
+    return (after - before) / before * 100
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list:
+    """
+    Print the comparison table and return the scenarios that regressed beyond threshold.
+    """
+    regressions = []
+    print(f"{'scenario':>24}  " + "  ".join(f"{metric:>28}" for metric in METRICS))
+    for name, before in baseline["scenarios"].items():
+        after = candidate["scenarios"].get(name)
+        if after is None:
+            print(f"{name:>24}  missing from candidate")
+            continue
+        cells = []
+        for metric in METRICS:
+            delta = change(before[metric], after[metric])
+            cells.append(f"{before[metric]:>10.2f} -> {after[metric]:>10.2f} {delta:>+5.0f}%")
+        print(f"{name:>24}  " + "  ".join(cells))
+        throughput_drop = -change(before["throughput_rps"], after["throughput_rps"])
+        if change(before["p95_ms"], after["p95_ms"]) > threshold or throughput_drop > threshold:
+            regressions.append(name)
+        if after["errors"] > before["errors"]:
+            print(f"{'':>24}  errors: {before['errors']} -> {after['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline", help="Results of the reference run")
+    parser.add_argument("candidate", help="Results of the run to check")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed p95 increase / throughput drop in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as baseline_file, open(args.candidate) as candidate_file:
+        baseline, candidate = json.load(baseline_file), json.load(candidate_file)
+    for key in ("products", "orders", "concurrency", "target"):
+        if baseline["meta"].get(key) != candidate["meta"].get(key):
+            print(f"warning: runs differ in {key}: {baseline['meta'].get(key)} vs {candidate['meta'].get(key)}")
+
+    regressions = compare(baseline, candidate, args.threshold)
+    if regressions:
+        print(f"Regressed by more than {args.threshold:.0f}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+CPU cost per response vs bytes saved for the compression policy.
+
+Renders product listing pages of several sizes and, for each page, compresses it
+with the old fixed policy (gzip level 9), the size-based gzip policy from
+src/middleware/compression.py, and brotli at the same levels when installed.
+Reports CPU time per response (process time) and the compressed size.
+
+    python -m benchmarks.compression --repeat 50
+"""
+import argparse
+import gzip
+import json
+import time
+from bson import ObjectId
+
+from src.middleware.compression import LEVELS, brotli, compress, level_for
+
+
+def make_page(rows: int) -> bytes:
+    data = [{"id": str(ObjectId()), "name": f"Product number {i}", "price": 10.0 + i} for i in range(rows)]
+    return json.dumps({"data": data, "page": {"next": rows, "limit": rows, "previous": None}}).encode()
+
+
+def measure(func, body: bytes, repeat: int):
+    start = time.process_time()
+    for _ in range(repeat):
+        compressed = func(body)
+    return (time.process_time() - start) / repeat * 1e6, len(compressed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 1000, 10000], help="Rows per listing page")
+    parser.add_argument("--repeat", type=int, default=50, help="Compressions per measurement")
+    args = parser.parse_args()
+
+    print(f"levels: {LEVELS}")
+    print(f"{'rows':>6} {'bytes':>9} {'policy':>12} {'level':>5} {'cpu us':>10} {'out bytes':>10} {'saved':>7}")
+    for rows in args.rows:
+        body = make_page(rows)
+        level = level_for(len(body))
+        policies = [
+            ("gzip-9", 9, lambda b: gzip.compress(b, compresslevel=9)),
+            ("gzip-policy", level, lambda b: compress(b, "gzip", level)),
+        ]
+        if brotli is not None:
+            policies.append(("br-policy", level, lambda b: compress(b, "br", level)))
+        for name, policy_level, func in policies:
+            cpu, size = measure(func, body, args.repeat)
+            print(f"{rows:>6} {len(body):>9} {name:>12} {policy_level:>5} {cpu:>10.1f} {size:>10} {1 - size / len(body):>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
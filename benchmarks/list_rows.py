@@ -0,0 +1,76 @@
+"""
+Micro-benchmark of the per-row cost of rendering a product listing page.
+
+"hydrated" reproduces the previous read path: full documents are loaded into
+mongoengine Document instances, copied into dicts and re-validated through the
+response_model before JSON encoding. "lean" is the current path: projected raw
+documents are mapped straight to the response shape and encoded. No database is
+needed; documents are generated in memory.
+
+    python -m benchmarks.list_rows --rows 100 --repeat 200
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime
+from bson import ObjectId
+
+from src.models.products import Products
+from src.repositories.products import PRODUCT_LIST_PROJECTION
+from src.schemas.response_schema import ListProductsResponse
+
+PAGE = {"next": 100, "limit": 100, "previous": None}
+
+
+def make_documents(rows: int) -> list:
+    now = datetime.now()
+    return [
+        {
+            "_id": ObjectId(),
+            "name": f"Product {i}",
+            "name_normalized": f"product {i}",
+            "name_tokens": ["product", str(i)],
+            "price": 10.0 + i,
+            "sizes": [{"size": size, "quantity": 5} for size in ("xs", "sm", "md", "lg", "xl", "xxl")],
+            "total_quantity": 30,
+            "reservations": [],
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(rows)
+    ]
+
+
+def hydrated(documents: list) -> bytes:
+    data = []
+    for document in documents:
+        product = Products._from_son(document)
+        data.append({"id": str(product.id), "name": product.name, "price": product.price})
+    response = ListProductsResponse.model_validate({"data": data, "page": PAGE})
+    return json.dumps(response.model_dump(mode="json")).encode()
+
+
+def lean(documents: list) -> bytes:
+    data = [{"id": str(document["_id"]), "name": document["name"], "price": document["price"]} for document in documents]
+    return json.dumps({"data": data, "page": PAGE}).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100, help="Rows per page")
+    parser.add_argument("--repeat", type=int, default=200, help="Pages rendered per measurement")
+    args = parser.parse_args()
+
+    documents = make_documents(args.rows)
+    projected = [{key: document[key] for key in ("_id", *PRODUCT_LIST_PROJECTION)} for document in documents]
+
+    results = {}
+    for label, render, rows in (("hydrated", hydrated, documents), ("lean", lean, projected)):
+        seconds = min(timeit.repeat(lambda: render(rows), number=args.repeat, repeat=5))
+        results[label] = seconds / (args.repeat * args.rows) * 1e6
+        print(f"{label:>9}: {results[label]:.2f} us/row")
+    print(f"  speedup: {results['hydrated'] / results['lean']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
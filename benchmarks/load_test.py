@@ -0,0 +1,307 @@
+"""
+Load test of every route in src/routers with concurrent clients.
+
+Seeds a catalog and an order history through the API itself (bulk product import,
+then order creation), then drives each scenario with --concurrency clients for
+--requests requests and writes throughput and p50/p95/p99 latency per scenario to
+a JSON file. Compare two result files with benchmarks.compare.
+
+Targets, in order of preference:
+
+- --base-url: a running server (point it at an empty database for comparable runs)
+- --mongodb-uri: the app in-process against MongoDB; the --db-name database is
+  dropped before seeding
+- --in-memory: the app in-process against mongomock-motor (pip install mongomock-motor);
+  useful for comparing app-side cost only
+
+    python -m benchmarks.load_test --mongodb-uri mongodb://localhost:27017 --output before.json
+    python -m benchmarks.load_test --in-memory --products 2000 --orders 5000 --requests 500
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+SIZES = ("xs", "sm", "md", "lg", "xl", "xxl")
+WORDS = ("classic", "cotton", "denim", "linen", "slim", "relaxed", "striped", "plain", "hooded", "crew")
+GARMENTS = ("shirt", "tee", "jacket", "hoodie", "polo", "sweater", "jeans", "shorts")
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if count else 0.0,
+    }
+
+
+def product_record(rng: random.Random, suffix: str, prefix: str) -> dict:
+    name = f"{prefix} {rng.choice(WORDS)} {rng.choice(GARMENTS)} {suffix}"
+    sizes = rng.sample(SIZES, rng.randint(2, len(SIZES)))
+    return {
+        "name": name,
+        "price": round(rng.uniform(5, 200), 2),
+        "sizes": [{"size": size, "quantity": rng.randint(1_000, 100_000)} for size in sizes],
+    }
+
+
+class Catalog:
+    """
+    What was seeded, so scenarios can build valid requests.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.products: List[dict] = []  # {"id", "sizes"}
+        self.users: List[int] = []
+        self.customers: List[int] = []  # users with at least one seeded order
+        self.orders = 0
+
+    def order_body(self, rng: random.Random, user_id: int) -> dict:
+        items = []
+        for product in rng.sample(self.products, min(len(self.products), rng.randint(1, 3))):
+            items.append({"productId": product["id"], "size": rng.choice(product["sizes"]), "qty": 1})
+        return {"userId": user_id, "items": items}
+
+
+async def seed(client: httpx.AsyncClient, args, rng: random.Random) -> Catalog:
+    catalog = Catalog(prefix=f"bench{int(time.time())}")
+    records = [product_record(rng, str(index), catalog.prefix) for index in range(args.products)]
+    for start in range(0, len(records), 5000):
+        batch = records[start:start + 5000]
+        body = "\n".join(json.dumps(record) for record in batch)
+        response = await client.post("/products/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+        response.raise_for_status()
+        for result in response.json()["results"]:
+            if result["status"] == "created":
+                record = batch[result["row"]]
+                catalog.products.append({"id": result["id"], "sizes": [size["size"] for size in record["sizes"]]})
+    if not catalog.products:
+        raise SystemExit("Seeding failed: no products were created")
+
+    catalog.users = list(range(1, args.users + 1))
+    queue = asyncio.Queue()
+    for _ in range(args.orders):
+        queue.put_nowait(catalog.order_body(rng, rng.choice(catalog.users)))
+
+    last_error = ""
+
+    async def worker():
+        nonlocal last_error
+        while not queue.empty():
+            body = queue.get_nowait()
+            response = await client.post("/orders/", json=body)
+            if response.status_code == 201:
+                catalog.orders += 1
+                catalog.customers.append(body["userId"])
+            else:
+                last_error = f"{response.status_code}: {response.text}"
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    if args.orders and not catalog.orders:
+        raise SystemExit(f"Seeding failed: no orders were created ({last_error})")
+    catalog.customers = sorted(set(catalog.customers)) or catalog.users
+    return catalog
+
+
+def scenarios(catalog: Catalog, rng: random.Random, args) -> Dict[str, Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]]:
+    """
+    One request factory per route; each call issues a single request.
+    """
+    # Created product names must stay unique across warm-up and measured runs
+    serial = itertools.count()
+
+    def word() -> str:
+        return rng.choice(WORDS)
+
+    def user() -> int:
+        return rng.choice(catalog.users)
+
+    def bulk_body() -> str:
+        batch = next(serial)
+        records = [product_record(rng, f"b{batch}r{row}", catalog.prefix) for row in range(args.bulk_size)]
+        return "\n".join(json.dumps(record) for record in records)
+
+    def bulk_create_products(client, index):
+        return client.post("/products/bulk", content=bulk_body(), headers={"Content-Type": "application/x-ndjson"})
+
+    return {
+        "list_products": lambda client, index: client.get("/products/", params={"limit": 20, "offset": rng.randint(0, 200)}),
+        "list_products_contains": lambda client, index: client.get("/products/", params={"name": word(), "limit": 20}),
+        "list_products_prefix": lambda client, index: client.get("/products/", params={"name": catalog.prefix, "search": "prefix", "limit": 20, "include_total": False}),
+        "list_products_size": lambda client, index: client.get("/products/", params={"size": rng.choice(SIZES), "limit": 20}),
+        "list_products_in_stock": lambda client, index: client.get("/products/", params={"size": rng.choice(SIZES), "in_stock": True, "limit": 20}),
+        "create_product": lambda client, index: client.post("/products/", json=product_record(rng, f"c{next(serial)}", catalog.prefix)),
+        "bulk_create_products": bulk_create_products,
+        "create_order": lambda client, index: client.post("/orders/", json=catalog.order_body(rng, user())),
+        "bulk_create_orders": lambda client, index: client.post("/orders/bulk", json=[catalog.order_body(rng, user()) for _ in range(args.bulk_size)]),
+        "list_orders": lambda client, index: client.get(f"/orders/{user()}", params={"limit": 20}),
+        "user_summary": lambda client, index: client.get(f"/orders/{rng.choice(catalog.customers)}/summary"),
+        "export_orders": lambda client, index: client.get("/orders/export", params={"userId": user()}),
+    }
+
+
+def is_error(response: httpx.Response) -> bool:
+    """
+    Bulk routes answer 200 with per-row results, so a bulk request with any failed row
+    counts as an error too; otherwise a scenario that writes nothing would look healthy.
+    """
+    if response.status_code >= 400:
+        return True
+    return response.request.url.path.endswith("/bulk") and response.json()["failed"] > 0
+
+
+async def run_scenario(client: httpx.AsyncClient, request: Callable, requests: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for index in counter:
+            start = time.perf_counter()
+            try:
+                response = await request(client, index)
+            except httpx.HTTPError:
+                response = None
+            latencies.append(time.perf_counter() - start)
+            failed = response is None or is_error(response)
+            errors += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def open_client(args) -> httpx.AsyncClient:
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if args.base_url:
+        return httpx.AsyncClient(base_url=args.base_url, timeout=timeout, limits=limits)
+
+    from loguru import logger
+    import src.db as db
+    from src.main import app
+
+    logger.remove()  # per-request application logs would dominate the measurement
+    if args.in_memory:
+        try:
+            import mongomock_motor
+        except ImportError:
+            raise SystemExit("--in-memory needs mongomock-motor: pip install mongomock-motor")
+        db._client = mongomock_motor.AsyncMongoMockClient()
+        db._database = db._client[args.db_name]
+    else:
+        os.environ["MONGODB_URI"] = args.mongodb_uri
+        os.environ["DB_NAME"] = args.db_name
+        db.connect_db()
+        db.get_database()  # raises when the connection failed
+        from mongoengine import get_db
+        get_db().client.drop_database(args.db_name)
+        db.sync_indexes()
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=timeout, limits=limits)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    async with open_client(args) as client:
+        started = time.perf_counter()
+        catalog = await seed(client, args, rng)
+        print(f"Seeded {len(catalog.products)} products and {catalog.orders} orders in {time.perf_counter() - started:.1f}s")
+
+        selected = scenarios(catalog, rng, args)
+        if args.scenarios:
+            unknown = set(args.scenarios) - set(selected)
+            if unknown:
+                raise SystemExit(f"Unknown scenarios: {sorted(unknown)}; choose from {sorted(selected)}")
+            selected = {name: request for name, request in selected.items() if name in args.scenarios}
+
+        results = {}
+        for name, request in selected.items():
+            if args.warmup:
+                await run_scenario(client, request, args.warmup, args.concurrency)
+            requests = max(1, args.requests // 10) if name.startswith("bulk_") else args.requests
+            results[name] = await run_scenario(client, request, requests, args.concurrency)
+            summary = results[name]
+            print(f"{name:>24}: {summary['throughput_rps']:>9.1f} req/s  p50 {summary['p50_ms']:>8.2f} ms  p95 {summary['p95_ms']:>8.2f} ms  p99 {summary['p99_ms']:>8.2f} ms  errors {summary['errors']}")
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "target": args.base_url or ("in-memory" if args.in_memory else "in-process"),
+            "products": args.products,
+            "orders": args.orders,
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "seed": args.seed,
+        },
+        "scenarios": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--base-url", help="URL of a running server")
+    target.add_argument("--in-memory", action="store_true", help="Run the app in-process against mongomock-motor")
+    parser.add_argument("--mongodb-uri", default=os.environ.get("MONGODB_URI") or "mongodb://localhost:27017", help="MongoDB for the in-process app")
+    parser.add_argument("--db-name", default="ecomm_benchmark", help="Database used (and dropped) by the in-process app")
+    parser.add_argument("--products", type=int, default=1000, help="Products to seed")
+    parser.add_argument("--orders", type=int, default=2000, help="Orders to seed")
+    parser.add_argument("--users", type=int, default=100, help="Distinct users the orders are spread over")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per scenario (a tenth for bulk requests)")
+    parser.add_argument("--warmup", type=int, default=50, help="Unmeasured requests per scenario")
+    parser.add_argument("--bulk-size", type=int, default=100, help="Products or orders per bulk request")
+    parser.add_argument("--scenarios", nargs="*", help="Only run these scenarios")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for data and request mix")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Request timeout in seconds")
+    parser.add_argument("--output", default="benchmark-results.json", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
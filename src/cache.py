@@ -0,0 +1,175 @@
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+from dotenv import load_dotenv
+from src.metrics import Gauge, registry
+from src.repositories import products as products_repository
+
+load_dotenv()
+
+
+class CacheBackend(ABC):
+    """
+    Storage used by ResponseCache. Implement this to share cached responses between
+    workers (e.g. backed by Redis or Memcached).
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+    def __len__(self) -> int:
+        return 0
+
+
+class InMemoryCache(CacheBackend):
+    """
+    Per-process LRU cache whose entries expire after their TTL.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ResponseCache:
+    """
+    Read-through cache for list responses, keyed on normalized query parameters,
+    with hit/miss counters.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(params: dict) -> str:
+        return json.dumps(params, sort_keys=True, default=str)
+
+    async def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        if self.enabled:
+            await self.backend.set(key, value, self.ttl)
+
+    async def invalidate(self) -> None:
+        if self.enabled:
+            await self.backend.clear()
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "hits": self.hits, "misses": self.misses, "entries": len(self.backend)}
+
+
+class CachedVersion:
+    """
+    In-process copy of a version counter stored in the database, re-read after ttl
+    seconds. Bumps made by this process are seen immediately; bumps made by other
+    workers within ttl seconds.
+    """
+
+    def __init__(self, load: Callable[[], Awaitable[int]], bump: Callable[[], Awaitable[int]], ttl: float):
+        self._load = load
+        self._bump = bump
+        self.ttl = ttl
+        self._value: Optional[int] = None
+        self._expires_at = 0.0
+
+    async def get(self) -> int:
+        if self._value is None or self._expires_at <= time.monotonic():
+            self._store(await self._load())
+        return self._value
+
+    async def bump(self) -> int:
+        self._store(await self._bump())
+        return self._value
+
+    def _store(self, value: int) -> None:
+        self._value = value
+        self._expires_at = time.monotonic() + self.ttl
+
+
+products_cache = ResponseCache(
+    InMemoryCache(max_entries=int(os.environ.get("PRODUCTS_CACHE_MAX_ENTRIES") or 1024)),
+    ttl=float(os.environ.get("PRODUCTS_CACHE_TTL") or 30),
+    enabled=(os.environ.get("PRODUCTS_CACHE_ENABLED") or "true").lower() == "true",
+)
+
+catalog_version = CachedVersion(
+    products_repository.get_catalog_version,
+    products_repository.bump_catalog_version,
+    ttl=float(os.environ.get("CATALOG_VERSION_CACHE_SECONDS") or 1),
+)
+
+
+async def catalog_changed() -> None:
+    """
+    Record a catalog change made by this process (products created or imported): bump the
+    catalog version (which changes listing ETags and cache keys in every worker) and drop
+    this process's cached listings. Stock changes (orders and sharded stock rollups) only
+    change listings when a size sells out or comes back, and refresh_in_stock_sizes bumps
+    the version for those.
+    """
+    await catalog_version.bump()
+    await products_cache.invalidate()
+
+
+def _cache_metrics() -> list:
+    """
+    Expose the response cache counters on /metrics.
+    """
+    hits = Gauge("response_cache_hits", "Response cache hits since startup.", ("cache",))
+    misses = Gauge("response_cache_misses", "Response cache misses since startup.", ("cache",))
+    entries = Gauge("response_cache_entries", "Entries currently held by the response cache.", ("cache",))
+    stats = products_cache.stats()
+    hits.set(stats["hits"], "products")
+    misses.set(stats["misses"], "products")
+    entries.set(stats["entries"], "products")
+    return [hits, misses, entries]
+
+
+registry.register_collector(_cache_metrics)
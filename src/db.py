@@ -1,28 +1,185 @@
-from mongoengine import connect, disconnect, DEFAULT_CONNECTION_NAME
+from mongoengine import connect, disconnect, get_db, DEFAULT_CONNECTION_NAME
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from dotenv import load_dotenv
+import asyncio
 import os
 from loguru import logger
+from src.metrics import event_listeners
 
 load_dotenv()
 
+# Driver options read from the environment; unset variables keep the driver defaults
+CLIENT_OPTIONS_ENV = {
+    "maxPoolSize": ("MONGO_MAX_POOL_SIZE", int),
+    "minPoolSize": ("MONGO_MIN_POOL_SIZE", int),
+    "maxIdleTimeMS": ("MONGO_MAX_IDLE_TIME_MS", int),
+    "waitQueueTimeoutMS": ("MONGO_WAIT_QUEUE_TIMEOUT_MS", int),
+    "connectTimeoutMS": ("MONGO_CONNECT_TIMEOUT_MS", int),
+    "serverSelectionTimeoutMS": ("MONGO_SERVER_SELECTION_TIMEOUT_MS", int),
+    "socketTimeoutMS": ("MONGO_SOCKET_TIMEOUT_MS", int),
+    "compressors": ("MONGO_COMPRESSORS", str),  # e.g. "zstd,snappy,zlib"
+    "readPreference": ("MONGO_READ_PREFERENCE", str),  # e.g. "primaryPreferred"
+}
+# Pool options only applied to the Motor client; the mongoengine client only syncs indexes
+POOL_OPTIONS = ("maxPoolSize", "minPoolSize", "maxIdleTimeMS", "waitQueueTimeoutMS")
+
+# Async client used by the request path (see src/repositories). The mongoengine
+# connection is kept for the document models, which still define the schema.
+_client: AsyncIOMotorClient = None
+_database: AsyncIOMotorDatabase = None
+
+
+def client_options() -> dict:
+    """
+    MongoClient keyword arguments configured through the MONGO_* environment variables.
+    """
+    options = {}
+    for option, (variable, cast) in CLIENT_OPTIONS_ENV.items():
+        value = os.environ.get(variable)
+        if value:
+            options[option] = cast(value)
+    # Command timings for /metrics; no listeners are registered when metrics are disabled
+    listeners = event_listeners()
+    if listeners:
+        options["event_listeners"] = listeners
+    return options
+
+
 def connect_db():
+    global _client, _database
+    options = client_options()
     try:
         connect(
             alias=DEFAULT_CONNECTION_NAME,
+            db=os.environ.get("DB_NAME") or None,
             host=os.environ.get("MONGODB_URI"),
+            **{option: value for option, value in options.items() if option not in POOL_OPTIONS},
         )
+        _client = AsyncIOMotorClient(os.environ.get("MONGODB_URI"), **options)
+        _database = _client.get_default_database(default=os.environ.get("DB_NAME") or "test")
         logger.info(f"Connected to the database successfully")
     except Exception as e:
         logger.error(f"Failed to connect to the database: {e}")
-        
+        return
+    try:
+        sync_indexes()
+    except Exception as e:
+        logger.error(f"Failed to reconcile database indexes: {e}")
+
+
+def _declared_indexes(model) -> dict:
+    """
+    The indexes a model declares, by name, as {"key", "unique", "collation"}. Unnamed
+    indexes get the driver's default name (e.g. "userId_1_created_at_1").
+    """
+    declared = {}
+    for spec in model._meta["index_specs"]:
+        key = list(spec["fields"])
+        name = spec.get("name") or "_".join(f"{field}_{direction}" for field, direction in key)
+        declared[name] = {"key": key, "unique": bool(spec.get("unique")), "collation": spec.get("collation")}
+    return declared
+
+
+def _same_index(declared: dict, existing: dict) -> bool:
+    """
+    Whether an existing index (from index_information) matches a declared one in key,
+    uniqueness and the collation options the declaration sets.
+    """
+    if list(existing["key"]) != declared["key"] or bool(existing.get("unique")) != declared["unique"]:
+        return False
+    collation = existing.get("collation") or {}
+    if not declared["collation"]:
+        return not collation
+    return all(collation.get(option) == value for option, value in declared["collation"].items())
+
+
+def sync_indexes() -> dict:
+    """
+    Compare the indexes declared in the models with the ones present in the database by
+    name, key and options, create the missing ones and report both missing and undeclared
+    (extra) indexes. A model whose indexes cannot be built (e.g. a unique index over
+    duplicate data) gets an "error" entry instead of stopping the others.
+    """
+    from src.models.orders import Orders
+    from src.models.products import Products, StockShards
+
+    report = {}
+    for model in (Products, Orders, StockShards):
+        collection_name = model._get_collection_name()
+        try:
+            declared = _declared_indexes(model)
+            existing = {
+                name: info
+                for name, info in get_db(DEFAULT_CONNECTION_NAME)[collection_name].index_information().items()
+                if name != "_id_"
+            }
+            missing = [name for name, spec in declared.items() if name not in existing or not _same_index(spec, existing[name])]
+            extra = [name for name, info in existing.items() if name not in declared or not _same_index(declared[name], info)]
+            report[collection_name] = {"missing": missing, "extra": extra}
+            if extra:
+                logger.warning(f"Indexes on {collection_name} not declared in the model (or with other options): {extra}")
+            model.ensure_indexes()
+            if missing:
+                logger.info(f"Created missing indexes on {collection_name}: {missing}")
+        except Exception as e:
+            report.setdefault(collection_name, {})["error"] = str(e)
+            logger.error(f"Failed to create the indexes of {collection_name}: {e}")
+    return report
+
+
+async def warm_up_pool():
+    """
+    Open the minimum pool (MONGO_MIN_POOL_SIZE, at least one connection) before serving
+    traffic by running that many concurrent pings, so the first requests do not pay
+    for connection setup.
+    """
+    if _database is None:
+        return
+    connections = max(1, int(os.environ.get("MONGO_MIN_POOL_SIZE") or 1))
+    try:
+        await asyncio.gather(*(_database.command("ping") for _ in range(connections)))
+        logger.info(f"Opened {connections} database connection(s)")
+    except Exception as e:
+        logger.error(f"Failed to warm up the database connection pool: {e}")
+
+
+async def ping_database(timeout: float) -> bool:
+    """
+    Return whether the database answers a ping within timeout seconds.
+    """
+    if _database is None:
+        return False
+    try:
+        await asyncio.wait_for(_database.command("ping"), timeout=timeout)
+        return True
+    except Exception as e:
+        logger.warning(f"Database ping failed: {e}")
+        return False
+
+
 def disconnect_db():
+    global _client, _database
     try:
         disconnect(
             alias=DEFAULT_CONNECTION_NAME
         )
+        if _client is not None:
+            _client.close()
+        _client = None
+        _database = None
         logger.info("Disconnected from the database successfully.")
     except Exception as e:
         logger.error(f"Failed to disconnect from the database: {e}")
 
+
+def get_database() -> AsyncIOMotorDatabase:
+    """
+    Return the async database handle opened by connect_db().
+    """
+    if _database is None:
+        raise RuntimeError("Database is not connected")
+    return _database
+
+
 if __name__ == "__main__":
-    connect_db()
\ No newline at end of file
+    connect_db()
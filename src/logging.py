@@ -1,10 +1,19 @@
+import os
 import sys
 from pathlib import Path
+from dotenv import load_dotenv
 
+load_dotenv()
+
+# Write file records as JSON lines (with the request fields bound by the logging middleware)
+LOG_JSON = (os.environ.get("LOG_JSON") or "false").lower() == "true"
+
+# enqueue=True hands records to a background thread, so formatting, file writes and
+# rotation/compression stay out of the request path
 config = {
     'handlers': [
-        {'sink': sys.stdout, 'level': 'INFO', 'colorize': True, 'format':"<green>{time}</green> | <blue>{level}</blue> | <level>{message}</level>"},
-        {'sink': Path(__file__).parent.parent / 'logs' / 'app.log', 'level': 'DEBUG', 'rotation': '1 MB', 'compression': 'zip', 'format': '{time} | {level} | {message}'},
-        {'sink': Path(__file__).parent.parent / 'logs' / 'error.log', 'level': 'ERROR', 'rotation': '1 MB', 'compression': 'zip', 'format': '{time} | {level} | {message}'}
+        {'sink': sys.stdout, 'level': 'INFO', 'colorize': True, 'enqueue': True, 'format':"<green>{time}</green> | <blue>{level}</blue> | <level>{message}</level>"},
+        {'sink': Path(__file__).parent.parent / 'logs' / 'app.log', 'level': 'DEBUG', 'rotation': '1 MB', 'compression': 'zip', 'enqueue': True, 'serialize': LOG_JSON, 'format': '{time} | {level} | {message}'},
+        {'sink': Path(__file__).parent.parent / 'logs' / 'error.log', 'level': 'ERROR', 'rotation': '1 MB', 'compression': 'zip', 'enqueue': True, 'serialize': LOG_JSON, 'format': '{time} | {level} | {message}'}
     ]
-}
\ No newline at end of file
+}
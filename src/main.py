@@ -1,14 +1,24 @@
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import Response, JSONResponse
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
 import uvicorn
+import asyncio
 from dotenv import load_dotenv
 import os
 from loguru import logger
-from uuid import uuid4
 
-from src.db import connect_db, disconnect_db
+from src.db import connect_db, disconnect_db, warm_up_pool
+from src.repositories.orders import clear_stale_reservations
+from src.repositories.stock_shards import rollup_stock
+from src.cache import products_cache
+from src.metrics import METRICS_ENABLED, render_latest
+from src.singleflight import orders_flight, products_flight
+from src.serialization import ResponseClass
+from src.middleware.admission import ADMISSION_ENABLED, AdmissionControlMiddleware
+from src.middleware.compression import CompressionMiddleware
+from src.middleware.metrics import MetricsMiddleware
+from src.middleware.request_logging import RequestLoggingMiddleware
+from src.routers import products, orders, health
 
 load_dotenv()
 
@@ -19,6 +29,7 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url="/openapi.json",
+    default_response_class=ResponseClass,
 )
 
 app.add_middleware(
@@ -29,45 +40,79 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.add_middleware(
-    GZipMiddleware,
-    minimum_size=1024,
-    compresslevel=9
-)
+app.add_middleware(CompressionMiddleware)
+
+# Sheds requests over a route's budget before they reach the handlers; inside the
+# metrics and logging middlewares so shed requests are still counted and logged
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware, routes=[route for router in (products.router, orders.router, health.router) for route in router.routes])
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Added last so it is outermost and its latency covers the whole stack
+app.add_middleware(RequestLoggingMiddleware)
 
-from src.routers import products, orders
 app.include_router(products.router)
 app.include_router(orders.router)
+app.include_router(health.router)
 
 from src.logging import config
 logger.configure(**config)
 
+# Seconds between rollups of sharded stock into product totals (0 disables the task)
+STOCK_ROLLUP_INTERVAL = float(os.environ.get("STOCK_ROLLUP_INTERVAL") or 30)
+# Seconds between sweeps of reservation markers left behind by interrupted orders (0 disables
+# the task), and the age after which a marker is considered abandoned
+RESERVATION_CLEANUP_INTERVAL = float(os.environ.get("RESERVATION_CLEANUP_INTERVAL") or 60)
+RESERVATION_MAX_AGE = float(os.environ.get("RESERVATION_MAX_AGE") or 300)
+_background_tasks = []
+
+
+async def rollup_stock_periodically():
+    while True:
+        await asyncio.sleep(STOCK_ROLLUP_INTERVAL)
+        try:
+            await rollup_stock()
+        except Exception as e:
+            logger.error(f"Failed to roll up sharded stock: {e}")
+
+
+async def clear_stale_reservations_periodically():
+    while True:
+        await asyncio.sleep(RESERVATION_CLEANUP_INTERVAL)
+        try:
+            confirmed, released = await clear_stale_reservations(RESERVATION_MAX_AGE)
+            if confirmed or released:
+                logger.warning(f"Cleared stale stock reservations: {confirmed} stored order(s) confirmed, {released} abandoned order(s) released")
+        except Exception as e:
+            logger.error(f"Failed to clear stale stock reservations: {e}")
+
+
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     logger.info(f"Server running on {os.environ.get('HOST')}:{os.environ.get('SERVER_PORT')}")
     connect_db()
+    await warm_up_pool()
+    if STOCK_ROLLUP_INTERVAL > 0:
+        _background_tasks.append(asyncio.create_task(rollup_stock_periodically()))
+    if RESERVATION_CLEANUP_INTERVAL > 0:
+        _background_tasks.append(asyncio.create_task(clear_stale_reservations_periodically()))
     
 @app.on_event("shutdown")
 def shutdown_event():
+    for task in _background_tasks:
+        task.cancel()
     disconnect_db()
     logger.info("Shutting down the server...")
-    
-
-@app.middleware("http")
-async def log_requests(request: Request, call_next) -> Response:
-    logger.info(f"Request: {request.method} {request.url}")
-    correlation_id = request.headers.get('X-Request-ID', str(uuid4()))
-    logger.info(f"Request ID: {correlation_id}")
-    response = await call_next(request)
-    response.headers['X-Request-ID'] = correlation_id
-    logger.info(f"Response: {response.status_code}")
-    return response
+    # Flush records still queued for the background sinks
+    logger.complete()
 
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Unhandled exception: {exc}")
-    return JSONResponse(
+    return ResponseClass(
         status_code=500,
         content={"detail": "An unexpected error occurred. Please try again later.", "status_code": 500}
     )
@@ -75,7 +120,7 @@ async def global_exception_handler(request: Request, exc: Exception):
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     logger.error(f"HTTP exception: {exc.detail}")
-    return JSONResponse(
+    return ResponseClass(
         status_code=exc.status_code,
         content={"detail": exc.detail, "status_code": exc.status_code}
     )
@@ -85,6 +130,21 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 async def root():
     return {"message": "Welcome to the E-commerce API. Use /docs for API documentation."}
 
+
+@app.get("/cache/stats", tags=["Root"])
+async def cache_stats():
+    return {
+        "products": products_cache.stats(),
+        "coalescing": {"products": products_flight.stats(), "orders": orders_flight.stats()},
+    }
+
+
+@app.get("/metrics", tags=["Root"], response_class=PlainTextResponse)
+async def metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(render_latest(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
     uvicorn.run(app, host=os.environ.get('HOST'), port=int(os.environ.get("SERVER_PORT")))
     
\ No newline at end of file
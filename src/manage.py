@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from bson import ObjectId
+from loguru import logger
+
+from src.db import connect_db, disconnect_db, get_database, sync_indexes
+from src.models.orders import Orders
+from src.models.products import Products, StockShards, NAME_COLLATION
+from src.repositories.orders import ORDERS_SORT, backfill_order_snapshots, build_export_filter, clear_stale_reservations, rebuild_user_summaries
+from src.repositories.products import PRODUCTS_SORT, SEARCH_PREFIX, SEARCH_TOKEN, backfill_search_fields, build_products_filter, refresh_in_stock_sizes
+from src.repositories.stock_shards import rollup_stock
+
+
+def _router_queries() -> list:
+    """
+    The queries issued by the routers, as (description, collection, filter, sort, collation).
+    """
+    products = Products._get_collection_name()
+    orders = Orders._get_collection_name()
+    return [
+        ("list_products", products, {}, PRODUCTS_SORT, None),
+        ("list_products by size", products, build_products_filter(size="md"), PRODUCTS_SORT, None),
+        ("list_products in stock", products, build_products_filter(in_stock=True), PRODUCTS_SORT, None),
+        ("list_products in stock by size", products, build_products_filter(size="md", in_stock=True), PRODUCTS_SORT, None),
+        ("list_products by name prefix", products, build_products_filter(name="ex", search=SEARCH_PREFIX), PRODUCTS_SORT, None),
+        ("list_products by name token", products, build_products_filter(name="example", search=SEARCH_TOKEN), PRODUCTS_SORT, None),
+        ("create_product name check", products, {"name": "example"}, None, NAME_COLLATION),
+        ("create_order product lookup", products, {"_id": {"$in": [ObjectId()]}}, None, None),
+        ("create_order stock slot", StockShards._get_collection_name(), {"productId": ObjectId(), "size": "md", "slot": 0}, None, None),
+        ("list_orders_by_userId", orders, {"userId": 0}, ORDERS_SORT, None),
+        ("export_orders by date range", orders, build_export_filter(start=datetime(2000, 1, 1)), ORDERS_SORT, None),
+    ]
+
+
+def _plan_stages(plan: dict) -> list:
+    stages = [plan.get("stage")]
+    for child in [plan.get("inputStage")] + plan.get("inputStages", []):
+        if child:
+            stages.extend(_plan_stages(child))
+    return stages
+
+
+async def check_query_plans() -> bool:
+    """
+    Explain every router query and report whether its winning plan avoids a collection scan.
+    """
+    database = get_database()
+    ok = True
+    for description, collection, query, sort, collation in _router_queries():
+        cursor = database[collection].find(query, collation=collation)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.limit(10).explain()
+        stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+        if "COLLSCAN" in stages:
+            ok = False
+            logger.error(f"{description}: collection scan ({' <- '.join(filter(None, stages))})")
+        else:
+            logger.info(f"{description}: {' <- '.join(filter(None, stages))}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="E-commerce API maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("check-indexes", help="Reconcile indexes and verify every router query uses one")
+    subparsers.add_parser("backfill-product-search", help="Populate name search fields of existing products")
+    subparsers.add_parser("backfill-product-stock", help="Populate in_stock_sizes of existing products from their sizes")
+    subparsers.add_parser("backfill-order-snapshots", help="Store item price snapshots and totals on existing orders")
+    subparsers.add_parser("rollup-stock", help="Recompute sizes and total_quantity of sharded products from their stock slots")
+    stale = subparsers.add_parser("clear-stale-reservations", help="Confirm or give back stock reservations left behind by interrupted orders")
+    stale.add_argument("--max-age", type=float, default=300, help="Seconds after which a reservation is considered abandoned")
+    subparsers.add_parser("rebuild-user-summaries", help="Recompute every user's order count, total spent and last order time from the orders")
+    args = parser.parse_args()
+
+    connect_db()
+    try:
+        if args.command == "check-indexes":
+            report = sync_indexes()
+            ok = asyncio.run(check_query_plans()) and not any("error" in entry for entry in report.values())
+            sys.exit(0 if ok else 1)
+        elif args.command == "backfill-product-search":
+            updated = asyncio.run(backfill_search_fields())
+            logger.info(f"Backfilled search fields of {updated} products")
+        elif args.command == "backfill-product-stock":
+            updated = asyncio.run(refresh_in_stock_sizes())
+            logger.info(f"Backfilled in-stock sizes of {updated} products")
+        elif args.command == "backfill-order-snapshots":
+            updated = asyncio.run(backfill_order_snapshots())
+            logger.info(f"Backfilled price snapshots of {updated} orders")
+        elif args.command == "rollup-stock":
+            updated = asyncio.run(rollup_stock())
+            logger.info(f"Rolled up sharded stock of {updated} products")
+        elif args.command == "clear-stale-reservations":
+            confirmed, released = asyncio.run(clear_stale_reservations(args.max_age))
+            logger.info(f"Confirmed {confirmed} stored and released {released} abandoned orders' reservations")
+        elif args.command == "rebuild-user-summaries":
+            rebuilt = asyncio.run(rebuild_user_summaries())
+            logger.info(f"Rebuilt the order summaries of {rebuilt} users")
+    finally:
+        disconnect_db()
+
+
+if __name__ == "__main__":
+    main()
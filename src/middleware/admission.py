@@ -0,0 +1,193 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from starlette.routing import BaseRoute, Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+from src.metrics import Counter, Gauge, Histogram, registry
+from src.serialization import ResponseClass
+
+load_dotenv()
+
+
+def _parse_limits(value: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Parse "METHOD /route=concurrency:queue" entries, e.g. "POST /orders/=64:256,GET /products/=256:1024",
+    into {"METHOD /route": (concurrency, queue)}. Routes are the templates declared in the routers.
+    """
+    limits = {}
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+        route, _, budget = entry.rpartition("=")
+        concurrency, queue = budget.split(":")
+        method, path = route.split()
+        limits[f"{method.upper()} {path}"] = (int(concurrency), int(queue))
+    return limits
+
+
+# Turn admission control off entirely
+ADMISSION_ENABLED = (os.environ.get("ADMISSION_ENABLED") or "true").lower() == "true"
+# Concurrent requests and queued requests allowed per route; writes and heavy reads get
+# their own budgets so they cannot starve cheap endpoints
+LIMITS = _parse_limits(
+    os.environ.get("ADMISSION_LIMITS")
+    or "POST /orders/=64:256,POST /orders/bulk=4:16,POST /products/=32:128,POST /products/bulk=4:16,"
+    "GET /orders/export=8:16,GET /orders/{user_id}=128:512,GET /products/=256:1024"
+)
+# Budget of routes not listed in ADMISSION_LIMITS ("concurrency:queue"; 0 concurrency means unlimited)
+DEFAULT_LIMIT = tuple(int(value) for value in (os.environ.get("ADMISSION_DEFAULT_LIMIT") or "0:0").split(":"))
+# Seconds a request may wait in the queue before it is shed
+QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT") or 2)
+# Retry-After seconds sent with shed requests
+RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER") or 1)
+
+admission_in_flight = registry.register(Gauge(
+    "admission_in_flight", "Requests admitted and being served, by route budget.", ("route",),
+))
+admission_queued = registry.register(Gauge(
+    "admission_queued", "Requests waiting for a slot, by route budget.", ("route",),
+))
+admission_rejected_total = registry.register(Counter(
+    "admission_rejected_total", "Requests shed with 503, by route budget and reason (queue_full or timeout).", ("route", "reason"),
+))
+admission_queue_wait_seconds = registry.register(Histogram(
+    "admission_queue_wait_seconds", "Time admitted requests spent waiting for a slot, by route budget.", ("route",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+))
+
+
+class Budget:
+    """
+    A concurrency limit with a bounded FIFO wait queue. A released slot is handed directly
+    to the oldest waiter, so queued requests are not overtaken by new arrivals.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self, timeout: float) -> Optional[str]:
+        """
+        Take a slot, waiting up to timeout seconds in the queue. Returns None once admitted,
+        or the reason the request was rejected.
+        """
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            admission_in_flight.inc(self.name)
+            return None
+        if len(self._waiters) >= self.queue:
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        admission_queued.inc(self.name)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=timeout)
+        except asyncio.TimeoutError:
+            # A slot handed over just as the wait timed out is kept
+            if self._abandon(waiter):
+                return "timeout"
+        except asyncio.CancelledError:
+            # The client went away while queued; give back a slot already handed over
+            if not self._abandon(waiter):
+                self.release()
+            raise
+        finally:
+            admission_queued.dec(self.name)
+        admission_queue_wait_seconds.observe(time.perf_counter() - start, self.name)
+        return None
+
+    def _abandon(self, waiter: asyncio.Future) -> bool:
+        """
+        Leave the queue. Returns False when a slot had already been handed to the waiter.
+        """
+        if waiter.done():
+            return False
+        waiter.cancel()
+        self._waiters.remove(waiter)
+        return True
+
+    def release(self) -> None:
+        # Hand the slot to the oldest waiter still waiting, or free it
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+        admission_in_flight.dec(self.name)
+
+
+class AdmissionControlMiddleware:
+    """
+    Limit concurrent requests per route so an overloaded route sheds its own excess with a
+    fast 503 and Retry-After instead of slowing every other route down. Requests over the
+    route's concurrency wait in a bounded queue for at most QUEUE_TIMEOUT seconds.
+
+    Requests are matched against the given routes (the same templates the metrics use),
+    e.g. app.add_middleware(AdmissionControlMiddleware, routes=orders.router.routes).
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        routes: List[BaseRoute],
+        limits: Dict[str, Tuple[int, int]] = LIMITS,
+        default_limit: Tuple[int, int] = DEFAULT_LIMIT,
+        queue_timeout: float = QUEUE_TIMEOUT,
+        retry_after: int = RETRY_AFTER,
+    ):
+        self.app = app
+        self.routes = routes
+        self.limits = limits
+        self.default_limit = default_limit
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.budgets: Dict[str, Budget] = {}
+
+    def _budget(self, scope: Scope) -> Optional[Budget]:
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                name = f"{scope['method']} {getattr(route, 'path', '')}"
+                break
+        else:
+            return None
+        budget = self.budgets.get(name)
+        if budget is None:
+            concurrency, queue = self.limits.get(name, self.default_limit)
+            if concurrency <= 0:
+                return None
+            budget = self.budgets[name] = Budget(name, concurrency, queue)
+        # Expose the matched route early so rejected requests are labelled by route too
+        scope["route"] = route
+        return budget
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        budget = self._budget(scope)
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+        reason = await budget.acquire(self.queue_timeout)
+        if reason is not None:
+            admission_rejected_total.inc(budget.name, reason)
+            response = ResponseClass(
+                status_code=503,
+                content={"detail": "Server is busy, please retry later", "status_code": 503},
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            budget.release()
@@ -0,0 +1,149 @@
+import gzip
+import hashlib
+import os
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip is offered
+    brotli = None
+
+load_dotenv()
+
+
+def _parse_levels(value: str) -> List[Tuple[float, int]]:
+    """
+    Parse "max_size:level" pairs, e.g. "16384:6,262144:4,inf:1", into sorted (max_size, level).
+    """
+    levels = []
+    for pair in value.split(","):
+        max_size, level = pair.split(":")
+        levels.append((float(max_size), int(level)))
+    return sorted(levels)
+
+
+# Bodies smaller than this are sent uncompressed
+MINIMUM_SIZE = int(os.environ.get("COMPRESSION_MINIMUM_SIZE") or 1024)
+# Compression level by body size: larger bodies get cheaper levels
+LEVELS = _parse_levels(os.environ.get("COMPRESSION_LEVELS") or "16384:6,262144:4,inf:1")
+# Compressed bodies of GET responses kept for identical bodies (0 disables the cache)
+CACHE_ENTRIES = int(os.environ.get("COMPRESSION_CACHE_ENTRIES") or 256)
+# Server preference among the encodings the client accepts
+ENCODINGS = [
+    encoding.strip() for encoding in (os.environ.get("COMPRESSION_ENCODINGS") or "br,gzip").split(",")
+    if encoding.strip() == "gzip" or (encoding.strip() == "br" and brotli is not None)
+]
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml")
+
+
+def level_for(size: int, levels: List[Tuple[float, int]] = LEVELS) -> int:
+    for max_size, level in levels:
+        if size <= max_size:
+            return level
+    return levels[-1][1]
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=min(level, 11))
+    return gzip.compress(body, compresslevel=level)
+
+
+def negotiate(accept_encoding: str, encodings: List[str] = ENCODINGS) -> Optional[str]:
+    """
+    Pick the first of the server's preferred encodings that an Accept-Encoding header allows.
+    """
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in encodings:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Compress complete response bodies with the best encoding the client accepts, choosing
+    the level from the body size. Small, already encoded, non-text and streaming responses
+    are passed through untouched. Compressed bodies of GET responses are cached by content
+    hash, so repeated identical bodies (e.g. cached listings) are only compressed once.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = MINIMUM_SIZE, levels: List[Tuple[float, int]] = LEVELS, cache_entries: int = CACHE_ENTRIES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = levels
+        self.cache_entries = cache_entries
+        self._cache: OrderedDict = OrderedDict()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        streaming = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, streaming
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or streaming:
+                await send(message)
+                return
+            if message.get("more_body", False):
+                # Streaming response: send it through as it is produced
+                streaming = True
+                await send(start_message)
+                await send(message)
+                return
+            body = message.get("body", b"")
+            headers = MutableHeaders(scope=start_message)
+            if self._should_compress(body, headers):
+                body = self._compress(body, encoding, cacheable=scope["method"] == "GET")
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                message = {**message, "body": body}
+            await send(start_message)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _should_compress(self, body: bytes, headers: MutableHeaders) -> bool:
+        if len(body) < self.minimum_size or "content-encoding" in headers:
+            return False
+        return headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+
+    def _compress(self, body: bytes, encoding: str, cacheable: bool) -> bytes:
+        level = level_for(len(body), self.levels)
+        if not cacheable or not self.cache_entries:
+            return compress(body, encoding, level)
+        key = (encoding, level, hashlib.blake2b(body, digest_size=16).digest())
+        compressed = self._cache.get(key)
+        if compressed is None:
+            compressed = compress(body, encoding, level)
+            self._cache[key] = compressed
+            if len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return compressed
@@ -0,0 +1,37 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from src.metrics import http_request_duration_seconds, http_requests_in_flight, http_requests_total
+
+
+class MetricsMiddleware:
+    """
+    Count and time every HTTP request by method, route template (e.g. /orders/{user_id},
+    so path parameters do not create new series) and status, and track requests in flight.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests_total.inc(method, route, str(status_code))
+            http_request_duration_seconds.observe(time.perf_counter() - start, method, route)
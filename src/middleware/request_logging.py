@@ -0,0 +1,65 @@
+import os
+import random
+import time
+from uuid import uuid4
+from dotenv import load_dotenv
+from loguru import logger
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+load_dotenv()
+
+# Fraction of successful (< 400) requests that are logged; errors are always logged
+SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE") or 1.0)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+
+class RequestLoggingMiddleware:
+    """
+    Emit one structured record per request (method, path, status, latency, request id) and
+    echo the request id in the X-Request-ID response header, reusing the client's if sent.
+    Successful requests are sampled at sample_rate; 4xx, 5xx and unhandled exceptions are
+    always logged.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: float = SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        request_id = Headers(scope=scope).get(REQUEST_ID_HEADER) or uuid4().hex
+        scope.setdefault("state", {})["request_id"] = request_id
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            self._log(scope, 500, start, request_id)
+            raise
+        self._log(scope, status_code, start, request_id)
+
+    def _log(self, scope: Scope, status_code: int, start: float, request_id: str) -> None:
+        if status_code < 400 and random.random() >= self.sample_rate:
+            return
+        latency_ms = round((time.perf_counter() - start) * 1000, 2)
+        record = logger.bind(
+            method=scope["method"],
+            path=scope["path"],
+            status=status_code,
+            latency_ms=latency_ms,
+            request_id=request_id,
+        )
+        level = "ERROR" if status_code >= 500 else "WARNING" if status_code >= 400 else "INFO"
+        record.log(level, f"{scope['method']} {scope['path']} {status_code} {latency_ms}ms request_id={request_id}")
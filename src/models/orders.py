@@ -1,19 +1,41 @@
-from mongoengine import Document, EmbeddedDocument, EmbeddedDocumentField, StringField, IntField, ListField, DateTimeField, ReferenceField
+from mongoengine import Document, EmbeddedDocument, EmbeddedDocumentField, StringField, IntField, FloatField, ListField, DateTimeField, ReferenceField, EnumField
 from datetime import datetime
-from src.models.products import Products
+from src.models.products import Products, SizesEnum
 
 
 class OrderItems(EmbeddedDocument):
     productId = ReferenceField(document_type=Products, required=True)
+    size = EnumField(SizesEnum, required=False)  # Optional to match orders stored before sizes were tracked
     quantity = IntField(min_value=1, required=True)
+    # Product name and unit price at order time; missing on orders stored before snapshots
+    name = StringField(required=False)
+    price = FloatField(required=False)
 
 class Orders(Document):
     name = StringField(required=False)  # Optional name field to match existing database schema
     userId = IntField(required=True)
     items = ListField(EmbeddedDocumentField(OrderItems), required=True)
-    created_at = DateTimeField(default=datetime.now())
-    updated_at = DateTimeField(default=datetime.now())
-    
+    total = FloatField(required=False)  # Precomputed from the item price snapshots
+    created_at = DateTimeField(default=datetime.now)
+    updated_at = DateTimeField(default=datetime.now)
+
     meta = {
         'collection': 'orders',
-    }
\ No newline at end of file
+        'indexes': [
+            ('userId', 'created_at', 'id'),
+            ('created_at', 'id'),
+        ],
+    }
+
+
+class UserSummaries(Document):
+    # Per-user order totals maintained by create_order; rebuilt with `manage rebuild-user-summaries`
+    userId = IntField(primary_key=True)
+    order_count = IntField(min_value=0, default=0)
+    total_spent = FloatField(default=0.0)
+    last_order_at = DateTimeField(required=False)
+    updated_at = DateTimeField(default=datetime.now)
+
+    meta = {
+        'collection': 'user_summaries',
+    }
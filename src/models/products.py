@@ -1,8 +1,22 @@
-from mongoengine import Document, EmbeddedDocument, EmbeddedDocumentField, StringField, ListField, FloatField, IntField, DateTimeField, EnumField
+from mongoengine import Document, EmbeddedDocument, EmbeddedDocumentField, StringField, ListField, FloatField, IntField, DateTimeField, EnumField, ObjectIdField
 from datetime import datetime
 from enum import Enum
 
 
+# Case-insensitive collation used for exact product name lookups
+NAME_COLLATION = {'locale': 'en', 'strength': 2}
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase a product name and collapse its whitespace, for prefix search."""
+    return " ".join(name.lower().split())
+
+
+def tokenize_name(name: str) -> list:
+    """Split a product name into its distinct lowercase words, for token search."""
+    return list(dict.fromkeys(name.lower().split()))
+
+
 class SizesEnum(Enum):
     XS = 'xs'
     SM = 'sm'
@@ -15,14 +29,62 @@ class Sizes(EmbeddedDocument):
     size = EnumField(SizesEnum, required=True)
     quantity = IntField(min_value=0, required=True)
 
+class StockReservation(EmbeddedDocument):
+    # Marks a stock decrement made for one line of an order until the order is stored
+    orderId = ObjectIdField(required=True)
+    line = IntField(min_value=0, required=True)
+    # Size and units taken by this marker (a stock slot may hold only part of the line), so
+    # markers left behind by an interrupted order can be given back
+    size = EnumField(SizesEnum, required=False)
+    quantity = IntField(min_value=1, required=False)
+
 class Products(Document):
-    name = StringField(regex=r'^[a-zA-Z0-9\s]+$', required=True, unique=True)
+    name = StringField(regex=r'^[a-zA-Z0-9\s]+$', required=True)
+    name_normalized = StringField(required=False)
+    name_tokens = ListField(StringField(), required=False)
     price = FloatField(min_value=1.0, required=True)
     sizes = ListField(EmbeddedDocumentField(Sizes), required=True)
     total_quantity = IntField(min_value=0, required=True)
-    created_at = DateTimeField(default=datetime.now())
-    updated_at = DateTimeField(default=datetime.now())
+    # Sizes with stock left, kept in sync with sizes for indexed availability filtering
+    in_stock_sizes = ListField(EnumField(SizesEnum), required=False)
+    reservations = ListField(EmbeddedDocumentField(StockReservation), required=False)
+    # Number of StockShards slots holding the stock; 0 when sizes/total_quantity hold it directly
+    stock_shards = IntField(min_value=0, default=0)
+    created_at = DateTimeField(default=datetime.now)
+    updated_at = DateTimeField(default=datetime.now)
     
     meta = {
         'collection': 'products',
-    }
\ No newline at end of file
+        'indexes': [
+            'sizes.size',
+            'in_stock_sizes',
+            # Names are unique regardless of case
+            {'fields': ['name'], 'name': 'name_ci', 'collation': NAME_COLLATION, 'unique': True},
+            'name_normalized',
+            'name_tokens',
+        ],
+    }
+    
+    def clean(self):
+        # Keep the search fields derived from the name in sync on every validation
+        if self.name:
+            self.name_normalized = normalize_name(self.name)
+            self.name_tokens = tokenize_name(self.name)
+        self.in_stock_sizes = [entry.size for entry in self.sizes or [] if entry.quantity and entry.quantity > 0]
+
+class StockShards(Document):
+    # One slot of a sharded product size's stock; the product's sizes and total_quantity
+    # become a rolled-up view of the slots
+    productId = ObjectIdField(required=True)
+    size = EnumField(SizesEnum, required=True)
+    slot = IntField(min_value=0, required=True)
+    quantity = IntField(min_value=0, required=True)
+    reservations = ListField(EmbeddedDocumentField(StockReservation), required=False)
+    updated_at = DateTimeField(default=datetime.now)
+    
+    meta = {
+        'collection': 'stock_shards',
+        'indexes': [
+            {'fields': ['productId', 'size', 'slot'], 'unique': True},
+        ],
+    }
@@ -0,0 +1,415 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from src.db import get_database
+from src.models.orders import Orders, UserSummaries
+from src.models.products import Products
+from src.repositories import stock_shards
+from src.repositories.pagination import Page, fetch_page
+from src.repositories.products import refresh_in_stock_sizes
+
+# Orders are paginated by creation time, with the id as tie-breaker
+ORDERS_SORT = [("created_at", 1), ("_id", 1)]
+
+# Fields needed to render an order listing row
+ORDER_LIST_PROJECTION = {"items": 1, "total": 1}
+
+
+def _orders():
+    return get_database()[Orders._get_collection_name()]
+
+
+def _products():
+    return get_database()[Products._get_collection_name()]
+
+
+def _summaries():
+    return get_database()[UserSummaries._get_collection_name()]
+
+
+async def find_products_by_ids(product_ids: List[ObjectId], projection: Optional[dict] = None) -> List[dict]:
+    """
+    Fetch all products with the given ids in one query, optionally projecting only some fields.
+    """
+    return await _products().find({"_id": {"$in": product_ids}}, projection).to_list(length=None)
+
+
+# (order id, [(product id, size, quantity), ...]) for each order of a reservation
+OrderLines = Tuple[ObjectId, List[Tuple[ObjectId, str, int]]]
+
+
+async def reserve_stock(order_id: ObjectId, lines: List[Tuple[ObjectId, str, int]], slots_by_product: Optional[Dict[ObjectId, int]] = None) -> bool:
+    """
+    Atomically decrement stock for every (product id, size, quantity) line of an order with
+    a single bulk write. Each update decrements the matching size entry (positional update)
+    and the product total together, and only applies while that size has enough stock; if
+    any line cannot be reserved the lines that were applied are released and False is returned.
+    """
+    return order_id in await reserve_stock_many([(order_id, lines)], slots_by_product)
+
+
+async def reserve_stock_many(orders: List[OrderLines], slots_by_product: Optional[Dict[ObjectId, int]] = None) -> Set[ObjectId]:
+    """
+    Reserve the lines of many orders with one unordered bulk write and return the ids of
+    the orders whose lines were all reserved. Orders that fell short on any line are
+    rolled back through their reservation markers, leaving the others in place.
+    Lines of products in slots_by_product (product id -> slots) are reserved from their
+    stock slots instead, concurrently with the bulk write.
+    """
+    slots_by_product = slots_by_product or {}
+    now = datetime.now()
+    operations = []
+    updated_product_ids = set()
+    sharded_lines = []
+    for order_id, lines in orders:
+        for line, (product_id, size, quantity) in enumerate(lines):
+            if product_id in slots_by_product:
+                sharded_lines.append((order_id, line, product_id, size, quantity))
+                continue
+            updated_product_ids.add(product_id)
+            operations.append(UpdateOne(
+                {
+                    "_id": product_id,
+                    "stock_shards": stock_shards.NOT_SHARDED,
+                    "total_quantity": {"$gte": quantity},
+                    "sizes": {"$elemMatch": {"size": size, "quantity": {"$gte": quantity}}},
+                },
+                {
+                    "$inc": {"sizes.$.quantity": -quantity, "total_quantity": -quantity},
+                    "$set": {"updated_at": now},
+                    "$push": {"reservations": {"orderId": order_id, "line": line, "size": size, "quantity": quantity}},
+                },
+            ))
+    
+    async def write():
+        if not operations:
+            return 0
+        matched = (await _products().bulk_write(operations, ordered=False)).matched_count
+        await refresh_in_stock_sizes(list(updated_product_ids))
+        return matched
+    
+    matched, sharded_applied = await asyncio.gather(write(), stock_shards.reserve_lines(sharded_lines, slots_by_product))
+    if matched == len(operations) and len(sharded_applied) == len(sharded_lines):
+        return {order_id for order_id, _ in orders}
+    
+    # Some lines fell short: find which were applied from the markers and roll back the incomplete orders
+    reserved = await _reserved_lines(orders) if matched else {}
+    applied: Dict[ObjectId, int] = {order_id: len(reserved_lines) for order_id, reserved_lines in reserved.items()}
+    for order_id, _ in sharded_applied:
+        applied[order_id] = applied.get(order_id, 0) + 1
+    failed = [(order_id, lines) for order_id, lines in orders if applied.get(order_id, 0) < len(lines)]
+    shard_reserved: Dict[ObjectId, Set[int]] = {}
+    for order_id, line in sharded_applied:
+        shard_reserved.setdefault(order_id, set()).add(line)
+    await _restore_lines(failed, reserved, shard_reserved)
+    return {order_id for order_id, _ in orders} - {order_id for order_id, _ in failed}
+
+
+async def _reserved_lines(orders: List[OrderLines]) -> Dict[ObjectId, Set[int]]:
+    """
+    Return, per order, the lines still marked as reserved on the product documents.
+    """
+    order_ids = [order_id for order_id, _ in orders]
+    product_ids = list({product_id for _, lines in orders for product_id, _, _ in lines})
+    products = await _products().find(
+        {"_id": {"$in": product_ids}, "reservations.orderId": {"$in": order_ids}},
+        {"reservations": 1},
+    ).to_list(length=None)
+    wanted = set(order_ids)
+    reserved: Dict[ObjectId, Set[int]] = {}
+    for product in products:
+        for reservation in product["reservations"]:
+            if reservation["orderId"] in wanted:
+                reserved.setdefault(reservation["orderId"], set()).add(reservation["line"])
+    return reserved
+
+
+async def _give_back(restored: List[Tuple[ObjectId, int, ObjectId, str, int]]) -> None:
+    """
+    Give back reserved (order id, line, product id, size, quantity) lines held on product
+    documents with one bulk write. Each update addresses the size entry by its position,
+    guarded on the size still being there, and only applies while the line's marker is
+    present, so a line is never given back twice.
+    """
+    if not restored:
+        return
+    product_ids = list({product_id for _, _, product_id, _, _ in restored})
+    positions = {
+        product["_id"]: {entry["size"]: index for index, entry in enumerate(product["sizes"])}
+        for product in await _products().find({"_id": {"$in": product_ids}}, {"sizes.size": 1}).to_list(length=None)
+    }
+    now = datetime.now()
+    operations = []
+    for order_id, line, product_id, size, quantity in restored:
+        index = positions.get(product_id, {}).get(size)
+        if index is None:
+            continue
+        operations.append(UpdateOne(
+            {"_id": product_id, f"sizes.{index}.size": size, "reservations": {"$elemMatch": {"orderId": order_id, "line": line}}},
+            {
+                "$inc": {f"sizes.{index}.quantity": quantity, "total_quantity": quantity},
+                "$set": {"updated_at": now},
+                "$pull": {"reservations": {"orderId": order_id, "line": line}},
+            },
+        ))
+    if operations:
+        await _products().bulk_write(operations, ordered=False)
+        await refresh_in_stock_sizes(product_ids)
+
+
+async def _restore_lines(orders: List[OrderLines], reserved: Dict[ObjectId, Set[int]], shard_reserved: Dict[ObjectId, Set[int]]) -> None:
+    """
+    Give back the stock of the reserved lines of the given orders: one bulk write for the
+    lines held on product documents and one for the lines held on stock slots.
+    """
+    await _give_back([
+        (order_id, line, product_id, size, quantity)
+        for order_id, lines in orders
+        for line, (product_id, size, quantity) in enumerate(lines)
+        if line in reserved.get(order_id, ())
+    ])
+    await stock_shards.restore_lines([
+        (order_id, line, product_id, quantity)
+        for order_id, lines in orders
+        for line, (product_id, _, quantity) in enumerate(lines)
+        if line in shard_reserved.get(order_id, ())
+    ])
+
+
+async def release_stock(order_id: ObjectId, lines: List[Tuple[ObjectId, str, int]]) -> None:
+    """
+    Give back the stock reserved for an order. Only lines still marked as reserved are
+    restored, so calling this for a partially applied reservation is safe.
+    """
+    await release_stock_many([(order_id, lines)])
+
+
+async def release_stock_many(orders: List[OrderLines]) -> None:
+    """
+    Give back the stock reserved for many orders, from product documents and stock slots.
+    """
+    if not orders:
+        return
+    order_ids = [order_id for order_id, _ in orders]
+    product_ids = list({product_id for _, lines in orders for product_id, _, _ in lines})
+    reserved, shard_reserved = await asyncio.gather(_reserved_lines(orders), stock_shards.reserved_lines(order_ids, product_ids))
+    await _restore_lines(orders, reserved, shard_reserved)
+
+
+async def confirm_stock(order_id: ObjectId, product_ids: List[ObjectId], sharded_product_ids: Optional[List[ObjectId]] = None) -> None:
+    """
+    Clear the reservation markers of a stored order; the stock stays decremented.
+    """
+    await confirm_stock_many([order_id], product_ids, sharded_product_ids)
+
+
+async def confirm_stock_many(order_ids: List[ObjectId], product_ids: List[ObjectId], sharded_product_ids: Optional[List[ObjectId]] = None) -> None:
+    """
+    Clear the reservation markers of stored orders; the stock stays decremented.
+    """
+    await _products().update_many(
+        {"_id": {"$in": product_ids}, "reservations.orderId": {"$in": order_ids}},
+        {"$pull": {"reservations": {"orderId": {"$in": order_ids}}}},
+    )
+    if sharded_product_ids:
+        await stock_shards.confirm_lines(order_ids, sharded_product_ids)
+
+
+async def clear_stale_reservations(max_age: float) -> Tuple[int, int]:
+    """
+    Resolve reservation markers older than max_age seconds, left behind when a request
+    stopped between reserving and confirming or releasing its stock (order ids carry their
+    creation time). Markers of stored orders are cleared; the stock of orders that were
+    never stored is given back. Returns the number of (confirmed, released) orders.
+    """
+    cutoff = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(seconds=max_age))
+    products, slots = await asyncio.gather(
+        _products().find({"reservations.orderId": {"$lt": cutoff}}, {"reservations": 1}).to_list(length=None),
+        stock_shards.stale_reservations(cutoff),
+    )
+    order_ids = {
+        reservation["orderId"]
+        for document in products + slots
+        for reservation in document["reservations"]
+        if reservation["orderId"] < cutoff
+    }
+    if not order_ids:
+        return 0, 0
+    stored = {order["_id"] for order in await _orders().find({"_id": {"$in": list(order_ids)}}, {"_id": 1}).to_list(length=None)}
+    abandoned = order_ids - stored
+    if stored:
+        await confirm_stock_many(list(stored), [product["_id"] for product in products], list({slot["productId"] for slot in slots}))
+    
+    # Markers written before they recorded their size and quantity can only be dropped
+    legacy = [
+        UpdateOne({"_id": product["_id"]}, {"$pull": {"reservations": {"orderId": reservation["orderId"], "line": reservation["line"]}}})
+        for product in products
+        for reservation in product["reservations"]
+        if reservation["orderId"] in abandoned and reservation.get("quantity") is None
+    ]
+    if legacy:
+        await _products().bulk_write(legacy, ordered=False)
+    await _give_back([
+        (reservation["orderId"], reservation["line"], product["_id"], reservation["size"], reservation["quantity"])
+        for product in products
+        for reservation in product["reservations"]
+        if reservation["orderId"] in abandoned and reservation.get("quantity") is not None
+    ])
+    await stock_shards.restore_lines([
+        (reservation["orderId"], reservation["line"], slot["productId"], reservation.get("quantity", 0))
+        for slot in slots
+        for reservation in slot["reservations"]
+        if reservation["orderId"] in abandoned
+    ])
+    return len(stored), len(abandoned)
+
+
+async def insert_order(order: Orders) -> ObjectId:
+    """
+    Validate and insert a new order document, returning its id.
+    """
+    order.validate()
+    result = await _orders().insert_one(order.to_mongo().to_dict())
+    return result.inserted_id
+
+
+async def insert_orders(orders: List[Orders]) -> Dict[int, str]:
+    """
+    Insert already validated orders with one unordered insert_many. Returns the error
+    message of the ones that failed, by position.
+    """
+    failures = {}
+    try:
+        await _orders().insert_many([order.to_mongo().to_dict() for order in orders], ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            failures[error["index"]] = error.get("errmsg", "Insert failed")
+    return failures
+
+
+async def find_orders_by_user(user_id: int, limit: int, offset: int = 0, cursor: Optional[str] = None, include_total: bool = True) -> Page:
+    """
+    Return one page of a user's orders, by offset or by keyset cursor, as raw documents
+    holding only the listing fields. The total comes from the user's summary, falling back
+    to a count for users without one.
+    """
+    page = await fetch_page(_orders(), {"userId": user_id}, ORDERS_SORT, limit, offset=offset, cursor=cursor, include_total=False, projection=ORDER_LIST_PROJECTION)
+    if not include_total:
+        return page
+    summary = await find_user_summary(user_id)
+    total = summary["order_count"] if summary else await _orders().count_documents({"userId": user_id})
+    return page._replace(total=total)
+
+
+async def find_user_summary(user_id: int) -> Optional[dict]:
+    """
+    Return a user's order count, total spent and last order time, if they have a summary.
+    """
+    return await _summaries().find_one({"_id": user_id})
+
+
+async def record_user_orders(orders: List[Orders]) -> None:
+    """
+    Add stored orders to their users' summaries with one upserting bulk write.
+    """
+    totals: Dict[int, Tuple[int, float, datetime]] = {}
+    for order in orders:
+        count, spent, last_order_at = totals.get(order.userId, (0, 0.0, order.created_at))
+        totals[order.userId] = (count + 1, spent + (order.total or 0.0), max(last_order_at, order.created_at))
+    now = datetime.now()
+    await _summaries().bulk_write([
+        UpdateOne(
+            {"_id": user_id},
+            {
+                "$inc": {"order_count": count, "total_spent": spent},
+                "$max": {"last_order_at": last_order_at},
+                "$set": {"updated_at": now},
+            },
+            upsert=True,
+        )
+        for user_id, (count, spent, last_order_at) in totals.items()
+    ], ordered=False)
+
+
+async def rebuild_user_summaries() -> int:
+    """
+    Recompute every user summary from the orders collection, replacing the existing ones.
+    Orders placed while this runs may be missed; run it when order traffic is quiet.
+    Returns the number of summaries written.
+    """
+    collection = UserSummaries._get_collection_name()
+    await _orders().aggregate([
+        {"$group": {
+            "_id": "$userId",
+            "order_count": {"$sum": 1},
+            "total_spent": {"$sum": {"$ifNull": ["$total", 0]}},
+            "last_order_at": {"$max": "$created_at"},
+        }},
+        {"$set": {"updated_at": "$$NOW"}},
+        {"$out": collection},
+    ]).to_list(length=None)
+    return await _summaries().count_documents({})
+
+
+def build_export_filter(user_id: Optional[int] = None, start: Optional[datetime] = None, end: Optional[datetime] = None) -> dict:
+    """
+    Build the orders filter for an export by user and creation time range.
+    """
+    query = {}
+    if user_id is not None:
+        query["userId"] = user_id
+    if start or end:
+        query["created_at"] = {}
+        if start:
+            query["created_at"]["$gte"] = start
+        if end:
+            query["created_at"]["$lt"] = end
+    return query
+
+
+async def stream_orders(query: dict, batch_size: int) -> AsyncIterator[dict]:
+    """
+    Iterate over every order matching the filter in creation order through a server-side
+    cursor, holding at most one batch in memory.
+    """
+    cursor = _orders().find(query).sort(ORDERS_SORT).batch_size(batch_size)
+    async for order in cursor:
+        yield order
+
+
+async def backfill_order_snapshots(batch_size: int = 500) -> int:
+    """
+    Store item name/price snapshots and the precomputed total on orders created before
+    they existed, using the current product prices. Every item is kept; items whose product
+    no longer exists get a null name and price and do not count towards the total.
+    Returns the number of orders updated.
+    """
+    collection = _orders()
+    updated = 0
+    batch = []
+
+    async def flush(orders: List[dict]) -> int:
+        product_ids = list({item["productId"] for order in orders for item in order["items"]})
+        products = {product["_id"]: product for product in await find_products_by_ids(product_ids, projection={"name": 1, "price": 1})}
+        operations = []
+        for order in orders:
+            items = []
+            for item in order["items"]:
+                product = products.get(item["productId"])
+                items.append({**item, "name": product["name"] if product else None, "price": product["price"] if product else None})
+            total = sum(item["price"] * item["quantity"] for item in items if item["price"] is not None)
+            operations.append(UpdateOne({"_id": order["_id"], "total": {"$exists": False}}, {"$set": {"items": items, "total": total}}))
+        result = await collection.bulk_write(operations, ordered=False)
+        return result.modified_count
+
+    async for order in collection.find({"total": {"$exists": False}}, {"items": 1}):
+        batch.append(order)
+        if len(batch) >= batch_size:
+            updated += await flush(batch)
+            batch = []
+    if batch:
+        updated += await flush(batch)
+    return updated
@@ -0,0 +1,113 @@
+import base64
+from typing import List, NamedTuple, Optional, Tuple
+from bson import json_util
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+NEXT = "next"
+PREVIOUS = "previous"
+
+
+class Page(NamedTuple):
+    documents: List[dict]
+    total: Optional[int]
+    next_cursor: Optional[str]
+    previous_cursor: Optional[str]
+    has_next: bool
+    has_previous: bool
+
+
+def encode_cursor(direction: str, document: dict, sort: List[Tuple[str, int]]) -> str:
+    """
+    Encode the sort key values of a document into an opaque cursor string.
+    """
+    payload = json_util.dumps({"d": direction, "k": [document.get(key) for key, _ in sort]})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, list]:
+    """
+    Decode a cursor produced by encode_cursor(). Raises ValueError for malformed cursors.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        direction, values = payload["d"], payload["k"]
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if direction not in (NEXT, PREVIOUS) or not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return direction, values
+
+
+def keyset_filter(sort: List[Tuple[str, int]], values: list, direction: str) -> dict:
+    """
+    Build the filter selecting documents strictly after (or before) the given sort key values.
+    """
+    clauses = []
+    for index, (key, order) in enumerate(sort):
+        forward = (order == 1) == (direction == NEXT)
+        clause = {sort[i][0]: values[i] for i in range(index)}
+        clause[key] = {"$gt" if forward else "$lt": values[index]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+async def fetch_page(
+    collection: AsyncIOMotorCollection,
+    query: dict,
+    sort: List[Tuple[str, int]],
+    limit: int,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    projection: Optional[dict] = None,
+) -> Page:
+    """
+    Fetch one page of documents, by keyset when a cursor is given and by offset otherwise.
+    One extra document is read to detect whether another page follows, so the total count
+    is only queried when requested. A projection always keeps the sort keys for the cursors.
+    """
+    if projection:
+        projection = {**projection, **{key: 1 for key, _ in sort}}
+    direction = NEXT
+    if cursor:
+        direction, values = decode_cursor(cursor)
+        if len(values) != len(sort):
+            raise ValueError("Invalid cursor")
+        page_query = {"$and": [query, keyset_filter(sort, values, direction)]} if query else keyset_filter(sort, values, direction)
+        page_sort = sort if direction == NEXT else [(key, -order) for key, order in sort]
+        documents = await collection.find(page_query, projection).sort(page_sort).limit(limit + 1).to_list(length=limit + 1)
+    else:
+        documents = await collection.find(query, projection).sort(sort).skip(offset).limit(limit + 1).to_list(length=limit + 1)
+
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    if direction == NEXT:
+        has_next, has_previous = has_more, bool(cursor) or offset > 0
+    else:
+        documents.reverse()
+        has_next, has_previous = True, has_more
+
+    total = await collection.count_documents(query) if include_total else None
+    return Page(
+        documents=documents,
+        total=total,
+        next_cursor=encode_cursor(NEXT, documents[-1], sort) if has_next and documents else None,
+        previous_cursor=encode_cursor(PREVIOUS, documents[0], sort) if has_previous and documents else None,
+        has_next=has_next,
+        has_previous=has_previous,
+    )
+
+
+def page_info(page: Page, limit: int, offset: int = 0, cursor: Optional[str] = None) -> dict:
+    """
+    Build the pagination block of a list response. Offsets are only reported in offset mode.
+    """
+    return {
+        "next": offset + limit if page.has_next and not cursor else None,
+        "limit": limit,
+        "previous": max(offset - limit, 0) if page.has_previous and not cursor else None,
+        "next_cursor": page.next_cursor,
+        "previous_cursor": page.previous_cursor,
+        "total": page.total,
+    }
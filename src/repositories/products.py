@@ -0,0 +1,173 @@
+import re
+from typing import Dict, List, Optional, Set, Tuple
+from bson import ObjectId
+from src.db import get_database
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from src.models.products import Products, SizesEnum, NAME_COLLATION, normalize_name, tokenize_name
+from src.repositories.pagination import Page, fetch_page
+
+# Products are paginated in insertion order
+PRODUCTS_SORT = [("_id", 1)]
+
+# Fields needed to render a product listing row
+PRODUCT_LIST_PROJECTION = {"name": 1, "price": 1}
+
+
+# Single document holding the catalog version, bumped on every product or stock change
+COUNTERS_COLLECTION = "counters"
+CATALOG_VERSION_ID = "catalog"
+
+
+# Sizes of a product document with stock left, as an aggregation expression
+IN_STOCK_SIZES = {"$map": {"input": {"$filter": {"input": "$sizes", "cond": {"$gt": ["$$this.quantity", 0]}}}, "in": "$$this.size"}}
+
+
+def _collection():
+    return get_database()[Products._get_collection_name()]
+
+
+# Name search modes: unanchored case-insensitive regex, indexed prefix, indexed whole words
+SEARCH_CONTAINS = "contains"
+SEARCH_PREFIX = "prefix"
+SEARCH_TOKEN = "token"
+
+
+def build_products_filter(name: Optional[str] = None, size: Optional[str] = None, search: str = SEARCH_CONTAINS, in_stock: bool = False) -> dict:
+    """
+    Build the products query filter for a name search and size membership. With in_stock,
+    only products with stock left (in that size, when given) match, through in_stock_sizes.
+    """
+    query = {}
+    if name and search == SEARCH_PREFIX:
+        query["name_normalized"] = {"$regex": f"^{re.escape(normalize_name(name))}"}
+    elif name and search == SEARCH_TOKEN:
+        query["name_tokens"] = {"$all": tokenize_name(name)}
+    elif name:
+        query["name"] = {"$regex": re.escape(name), "$options": "i"}
+    if in_stock:
+        query["in_stock_sizes"] = size if size else {"$in": [entry.value for entry in SizesEnum]}
+    elif size:
+        query["sizes"] = {"$elemMatch": {"size": size}}
+    return query
+
+
+async def find_product_by_name(name: str) -> Optional[dict]:
+    """
+    Find a product by name, ignoring case (served by the case-insensitive name index).
+    """
+    return await _collection().find_one({"name": name}, collation=NAME_COLLATION)
+
+
+async def find_product_by_id(product_id: ObjectId, projection: Optional[dict] = None) -> Optional[dict]:
+    """
+    Find a product by id, optionally projecting only some fields.
+    """
+    return await _collection().find_one({"_id": product_id}, projection)
+
+
+async def insert_product(product: Products) -> ObjectId:
+    """
+    Validate and insert a new product document, returning its id.
+    """
+    product.validate()
+    result = await _collection().insert_one(product.to_mongo().to_dict())
+    return result.inserted_id
+
+
+async def find_existing_names(names: List[str]) -> Set[str]:
+    """
+    Return the lowercased names, among the given ones, that already exist (ignoring case),
+    using a single $in query.
+    """
+    if not names:
+        return set()
+    products = await _collection().find({"name": {"$in": names}}, {"name": 1}, collation=NAME_COLLATION).to_list(length=None)
+    return {product["name"].lower() for product in products}
+
+
+async def insert_products(products: List[Products]) -> Tuple[List[ObjectId], Dict[int, str]]:
+    """
+    Insert already validated products with one unordered insert_many. Returns the id of
+    every document and the error message of the ones that failed, by position.
+    """
+    documents = [product.to_mongo().to_dict() for product in products]
+    for document in documents:
+        document.setdefault("_id", ObjectId())
+    failures = {}
+    try:
+        await _collection().insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            duplicate = error.get("code") == 11000
+            failures[error["index"]] = "Product with this name already exists" if duplicate else error.get("errmsg", "Insert failed")
+    return [document["_id"] for document in documents], failures
+
+
+async def find_products(query: dict, limit: int, offset: int = 0, cursor: Optional[str] = None, include_total: bool = True) -> Page:
+    """
+    Return one page of products matching the filter, by offset or by keyset cursor, as raw
+    documents holding only the listing fields.
+    """
+    return await fetch_page(_collection(), query, PRODUCTS_SORT, limit, offset=offset, cursor=cursor, include_total=include_total, projection=PRODUCT_LIST_PROJECTION)
+
+
+async def get_catalog_version() -> int:
+    """
+    Return the current catalog version (0 before the first change).
+    """
+    counter = await get_database()[COUNTERS_COLLECTION].find_one({"_id": CATALOG_VERSION_ID})
+    return counter["version"] if counter else 0
+
+
+async def bump_catalog_version() -> int:
+    """
+    Increment the catalog version and return the new value.
+    """
+    counter = await get_database()[COUNTERS_COLLECTION].find_one_and_update(
+        {"_id": CATALOG_VERSION_ID},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return counter["version"]
+
+
+async def refresh_in_stock_sizes(product_ids: Optional[List[ObjectId]] = None) -> int:
+    """
+    Recompute in_stock_sizes from sizes on the given products (all products when None),
+    writing only the documents where it changed. Each update reads the document's current
+    sizes, so the field converges after concurrent stock changes. When a size sold out or
+    came back the catalog version is bumped, since in_stock listings changed; other stock
+    changes leave it alone. Returns the number of products updated.
+    """
+    query = {"$expr": {"$ne": [{"$ifNull": ["$in_stock_sizes", None]}, IN_STOCK_SIZES]}}
+    if product_ids is not None:
+        if not product_ids:
+            return 0
+        query["_id"] = {"$in": product_ids}
+    result = await _collection().update_many(query, [{"$set": {"in_stock_sizes": IN_STOCK_SIZES}}])
+    if result.modified_count:
+        await bump_catalog_version()
+    return result.modified_count
+
+
+async def backfill_search_fields(batch_size: int = 1000) -> int:
+    """
+    Populate the name search fields of products stored before they existed. Returns the
+    number of products updated.
+    """
+    collection = _collection()
+    updated = 0
+    operations = []
+    async for product in collection.find({"name_normalized": {"$exists": False}}, {"name": 1}):
+        operations.append(UpdateOne(
+            {"_id": product["_id"]},
+            {"$set": {"name_normalized": normalize_name(product["name"]), "name_tokens": tokenize_name(product["name"])}},
+        ))
+        if len(operations) >= batch_size:
+            updated += (await collection.bulk_write(operations, ordered=False)).modified_count
+            operations = []
+    if operations:
+        updated += (await collection.bulk_write(operations, ordered=False)).modified_count
+    return updated
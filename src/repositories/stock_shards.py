@@ -0,0 +1,221 @@
+import asyncio
+import random
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from src.db import get_database
+from src.models.products import Products, SizesEnum, StockShards
+from src.repositories.products import refresh_in_stock_sizes
+
+# Matches products whose stock is held on the product document itself
+NOT_SHARDED = {"$not": {"$gt": 0}}
+
+
+def _shards():
+    return get_database()[StockShards._get_collection_name()]
+
+
+def _products():
+    return get_database()[Products._get_collection_name()]
+
+
+def split_quantity(quantity: int, slots: int) -> List[int]:
+    """
+    Split a quantity as evenly as possible over the given number of slots.
+    """
+    share, remainder = divmod(quantity, slots)
+    return [share + (1 if slot < remainder else 0) for slot in range(slots)]
+
+
+async def enable_stock_shards(product_id: ObjectId, slots: int) -> Optional[dict]:
+    """
+    Move a product's stock into `slots` counter slots per size. The product is flagged
+    first, which stops reservations against the product document, then its quantities at
+    that moment are spread over the slots; the flag is rolled back if the slots cannot be
+    written. Returns None when the product does not exist, is already sharded or has
+    reservations in flight.
+    """
+    product = await _products().find_one_and_update(
+        {"_id": product_id, "stock_shards": NOT_SHARDED, "reservations.0": {"$exists": False}},
+        {"$set": {"stock_shards": slots, "updated_at": datetime.now()}},
+        projection={"sizes": 1, "stock_shards": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if product is None:
+        return None
+    now = datetime.now()
+    try:
+        await _shards().insert_many([
+            {"productId": product_id, "size": entry["size"], "slot": slot, "quantity": quantity, "reservations": [], "updated_at": now}
+            for entry in product["sizes"]
+            for slot, quantity in enumerate(split_quantity(entry["quantity"], slots))
+        ])
+    except Exception:
+        await _shards().delete_many({"productId": product_id})
+        await _products().update_one({"_id": product_id}, {"$set": {"stock_shards": 0, "updated_at": datetime.now()}})
+        raise
+    return product
+
+
+async def _take(slot: dict, order_id: ObjectId, line: int, quantity: int, now: datetime) -> bool:
+    """
+    Decrement the slot matching the filter by quantity if it holds that much, marking the
+    portion for the line.
+    """
+    result = await _shards().update_one(
+        {**slot, "quantity": {"$gte": quantity}},
+        {
+            "$inc": {"quantity": -quantity},
+            "$set": {"updated_at": now},
+            "$push": {"reservations": {"orderId": order_id, "line": line, "quantity": quantity}},
+        },
+    )
+    return bool(result.modified_count)
+
+
+async def _give_back(slot_id: ObjectId, order_id: ObjectId, line: int, quantity: int) -> None:
+    await _shards().update_one(
+        {"_id": slot_id, "reservations": {"$elemMatch": {"orderId": order_id, "line": line}}},
+        {
+            "$inc": {"quantity": quantity},
+            "$set": {"updated_at": datetime.now()},
+            "$pull": {"reservations": {"orderId": order_id, "line": line}},
+        },
+    )
+
+
+async def _reserve_line(order_id: ObjectId, line: int, product_id: ObjectId, size: str, quantity: int, slots: int) -> bool:
+    """
+    Reserve one order line, from a random slot when one holds enough, otherwise split over
+    the slots with stock, largest first, with one marker per slot portion. A line that
+    cannot be covered in full gives back the portions it took.
+    """
+    now = datetime.now()
+    if await _take({"productId": product_id, "size": size, "slot": random.randrange(slots)}, order_id, line, quantity, now):
+        return True
+    
+    candidates = await _shards().find(
+        {"productId": product_id, "size": size, "quantity": {"$gt": 0}}, {"quantity": 1},
+    ).sort("quantity", -1).to_list(length=None)
+    if sum(candidate["quantity"] for candidate in candidates) < quantity:
+        return False
+    remaining = quantity
+    taken = []
+    for candidate in candidates:
+        portion = min(remaining, candidate["quantity"])
+        # A slot drained concurrently since it was read is skipped
+        if await _take({"_id": candidate["_id"]}, order_id, line, portion, now):
+            taken.append((candidate["_id"], portion))
+            remaining -= portion
+            if not remaining:
+                return True
+    await asyncio.gather(*(_give_back(slot_id, order_id, line, portion) for slot_id, portion in taken))
+    return False
+
+
+async def reserve_lines(lines: List[Tuple[ObjectId, int, ObjectId, str, int]], slots_by_product: Dict[ObjectId, int]) -> Set[Tuple[ObjectId, int]]:
+    """
+    Reserve (order id, line, product id, size, quantity) lines of sharded products
+    concurrently. Returns the (order id, line) pairs that were reserved in full.
+    """
+    applied = await asyncio.gather(*(
+        _reserve_line(order_id, line, product_id, size, quantity, slots_by_product[product_id])
+        for order_id, line, product_id, size, quantity in lines
+    ))
+    return {(order_id, line) for (order_id, line, _, _, _), ok in zip(lines, applied) if ok}
+
+
+async def reserved_lines(order_ids: List[ObjectId], product_ids: List[ObjectId]) -> Dict[ObjectId, Set[int]]:
+    """
+    Return, per order, the lines still marked as reserved on stock slots.
+    """
+    slots = await _shards().find(
+        {"productId": {"$in": product_ids}, "reservations.orderId": {"$in": order_ids}},
+        {"reservations": 1},
+    ).to_list(length=None)
+    wanted = set(order_ids)
+    reserved: Dict[ObjectId, Set[int]] = {}
+    for slot in slots:
+        for reservation in slot["reservations"]:
+            if reservation["orderId"] in wanted:
+                reserved.setdefault(reservation["orderId"], set()).add(reservation["line"])
+    return reserved
+
+
+async def restore_lines(lines: List[Tuple[ObjectId, int, ObjectId, int]]) -> None:
+    """
+    Give back the stock of reserved (order id, line, product id, quantity) lines to the
+    slots holding their markers, each slot getting back the portion its marker records,
+    with one bulk write.
+    """
+    if not lines:
+        return
+    wanted = {(order_id, line): quantity for order_id, line, _, quantity in lines}
+    slots = await _shards().find(
+        {"productId": {"$in": list({product_id for _, _, product_id, _ in lines})}, "reservations.orderId": {"$in": list({order_id for order_id, _ in wanted})}},
+        {"reservations": 1},
+    ).to_list(length=None)
+    now = datetime.now()
+    operations = [
+        UpdateOne(
+            {"_id": slot["_id"], "reservations": {"$elemMatch": {"orderId": reservation["orderId"], "line": reservation["line"]}}},
+            {
+                # Markers written before portions were recorded cover the whole line
+                "$inc": {"quantity": reservation.get("quantity", wanted[(reservation["orderId"], reservation["line"])])},
+                "$set": {"updated_at": now},
+                "$pull": {"reservations": {"orderId": reservation["orderId"], "line": reservation["line"]}},
+            },
+        )
+        for slot in slots
+        for reservation in slot["reservations"]
+        if (reservation["orderId"], reservation["line"]) in wanted
+    ]
+    if operations:
+        await _shards().bulk_write(operations, ordered=False)
+
+
+async def stale_reservations(cutoff: ObjectId) -> List[dict]:
+    """
+    Return the slots holding markers of orders whose id predates cutoff, with their
+    productId and reservations.
+    """
+    return await _shards().find({"reservations.orderId": {"$lt": cutoff}}, {"productId": 1, "reservations": 1}).to_list(length=None)
+
+
+async def confirm_lines(order_ids: List[ObjectId], product_ids: List[ObjectId]) -> None:
+    """
+    Clear the reservation markers of stored orders from the slots; the stock stays decremented.
+    """
+    await _shards().update_many(
+        {"productId": {"$in": product_ids}, "reservations.orderId": {"$in": order_ids}},
+        {"$pull": {"reservations": {"orderId": {"$in": order_ids}}}},
+    )
+
+
+async def rollup_stock() -> int:
+    """
+    Recompute the sizes and total_quantity of every sharded product from its slots, then
+    their in_stock_sizes, which bumps the catalog version only when a size sold out or came
+    back. Returns the number of products updated.
+    """
+    totals: Dict[ObjectId, Dict[str, int]] = {}
+    async for row in _shards().aggregate([
+        {"$group": {"_id": {"productId": "$productId", "size": "$size"}, "quantity": {"$sum": "$quantity"}}},
+    ]):
+        totals.setdefault(row["_id"]["productId"], {})[row["_id"]["size"]] = row["quantity"]
+    if not totals:
+        return 0
+    order = [size.value for size in SizesEnum]
+    result = await _products().bulk_write([
+        UpdateOne(
+            {"_id": product_id, "stock_shards": {"$gt": 0}},
+            {"$set": {
+                "sizes": [{"size": size, "quantity": sizes[size]} for size in sorted(sizes, key=order.index)],
+                "total_quantity": sum(sizes.values()),
+            }},
+        )
+        for product_id, sizes in totals.items()
+    ], ordered=False)
+    await refresh_in_stock_sizes(list(totals))
+    return result.modified_count
@@ -15,14 +15,46 @@ REQUEST BODY
 RESPONSE - {id: str | int}
 
 
+BULK CREATE PRODUCTS API:
+ENDPOINT - /products/bulk
+REQUEST BODY - NDJSON (Content-Type: application/x-ndjson) or a JSON array of CREATE PRODUCTS bodies
+QUERY PARAMETERS
+- chunk_size: int (records validated and inserted per batch)
+RESPONSE
+{
+    created: int,
+    failed: int,
+    results: [
+        {
+            row: int,
+            status: "created" | "error",
+            id: str | int,
+            detail: str,
+        }
+    ]
+}
+
+
+SHARD PRODUCT STOCK API:
+ENDPOINT - /products/{product_id}/stock-shards
+REQUEST BODY - {shards: int (2-64 counter slots per size)}
+RESPONSE - {id: str | int, shards: int}
+
+
 LIST PRODUCTS API:
 ENDPOINT - /products
 QUERY PARAMETERS 
 - name: str (can include regex for partial matching)
+- search: str (optional, "contains" (default), "prefix" or "token" name matching)
 - size: str (optional, to filter by size)
-- limit: int
-- offset: int
-RESPONSE 
+- in_stock: bool (optional, only products with stock left, in the given size if any)
+- limit: int (1-100)
+- offset: int (>= 0)
+- cursor: str (optional, opaque cursor for keyset pagination)
+- include_total: bool (optional, set false to skip counting)
+HEADERS
+- If-None-Match: str (optional, ETag of a previous listing; 304 Not Modified while the catalog is unchanged)
+RESPONSE (with an ETag header)
 {
     data: [
         {
@@ -35,6 +67,9 @@ RESPONSE
         next: int,
         limit: int,
         previous: int,
+        next_cursor: str,
+        previous_cursor: str,
+        total: int,
     }
 }
 
@@ -47,6 +82,7 @@ REQUEST BODY
     items: [
         {
             productId: str | int,
+            size: str,
             quantity: int
         }
     ]
@@ -54,11 +90,45 @@ REQUEST BODY
 RESPONSE - {id: str | int}
 
 
+BULK CREATE ORDERS API:
+ENDPOINT - /orders/bulk
+REQUEST BODY - JSON array of CREATE ORDERS bodies
+QUERY PARAMETERS
+- chunk_size: int (orders reserved and inserted per batch)
+RESPONSE
+{
+    created: int,
+    failed: int,
+    results: [
+        {
+            row: int,
+            status: "created" | "error",
+            id: str | int,
+            status_code: int,
+            detail: str | list,
+        }
+    ]
+}
+
+
+EXPORT ORDERS API:
+ENDPOINT - /orders/export
+QUERY PARAMETERS
+- format: str ("ndjson" (default) or "csv")
+- userId: int (optional)
+- start: datetime (optional, created_at >= start)
+- end: datetime (optional, created_at < end)
+- batch_size: int (orders fetched per round trip)
+RESPONSE - streamed NDJSON order records, or CSV with one row per order item
+
+
 LIST ORDERS API:
 ENDPOINT - /orders/{userId}
 QUERY PARAMETERS
-- limit: int
-- offset: int
+- limit: int (1-100)
+- offset: int (>= 0)
+- cursor: str (optional, opaque cursor for keyset pagination)
+- include_total: bool (optional, set false to leave out the total, read from the user summary)
 RESPONSE 
 {
     data: [
@@ -70,6 +140,7 @@ RESPONSE
                         id: str | int,
                         name: str,
                     },
+                    size: str,
                     quantity: int
                 }
             ],
@@ -80,6 +151,20 @@ RESPONSE
         next: int,
         limit: int,
         previous: int,
+        next_cursor: str,
+        previous_cursor: str,
+        total: int,
     }
 }
-'''
+
+
+USER ORDER SUMMARY API:
+ENDPOINT - /orders/{userId}/summary
+RESPONSE - 404 when the user has no orders
+{
+    userId: int,
+    order_count: int,
+    total_spent: float,
+    last_order_at: datetime,
+}
+'''
\ No newline at end of file
@@ -0,0 +1,45 @@
+import asyncio
+import os
+import time
+from fastapi import APIRouter, status
+from dotenv import load_dotenv
+from src.db import ping_database
+from src.serialization import render
+
+load_dotenv()
+
+# How long a ping result is reused, so frequent probes do not each hit the database
+READY_CACHE_SECONDS = float(os.environ.get("HEALTH_READY_CACHE_SECONDS") or 5)
+READY_PING_TIMEOUT = float(os.environ.get("HEALTH_READY_PING_TIMEOUT") or 2)
+
+router = APIRouter(
+    prefix='/health',
+    tags=["health"],
+)
+
+_ready = {"checked_at": None, "ok": False}
+_ready_lock = asyncio.Lock()
+
+
+@router.get("/live", status_code=status.HTTP_200_OK)
+async def live():
+    """
+    Liveness: the process is up and serving requests.
+    """
+    return {"status": "ok"}
+
+
+@router.get("/ready", status_code=status.HTTP_200_OK)
+async def ready():
+    """
+    Readiness: the database answers a ping. The result is cached for
+    HEALTH_READY_CACHE_SECONDS; returns 503 while the database is unreachable.
+    """
+    async with _ready_lock:
+        checked_at = _ready["checked_at"]
+        if checked_at is None or time.monotonic() - checked_at >= READY_CACHE_SECONDS:
+            _ready["ok"] = await ping_database(READY_PING_TIMEOUT)
+            _ready["checked_at"] = time.monotonic()
+    if _ready["ok"]:
+        return render({"status": "ready", "database": "ok"})
+    return render({"status": "not ready", "database": "unreachable"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
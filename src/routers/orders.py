@@ -1,13 +1,22 @@
-from typing import Union
-from fastapi import APIRouter, HTTPException, Path, Query, status
+import csv
+import io
+from typing import Any, AsyncIterator, List, Optional, Tuple, Union
+from fastapi import APIRouter, Body, HTTPException, Path, Query, status
+from fastapi.responses import StreamingResponse
 from loguru import logger
 from bson import ObjectId
+from mongoengine import ValidationError
+from pydantic import ValidationError as PayloadValidationError
 from dotenv import load_dotenv
 from datetime import datetime
 from src.models.orders import Orders, OrderItems
-from src.models.products import Products
-from src.schemas.requests_schema import CreateOrdersRequest, OrdersRequestQueryParams
-from src.schemas.response_schema import ListOrdersResponse, CreateOrdersResponse
+from src.models.products import SizesEnum
+from src.repositories import orders as orders_repository
+from src.repositories.pagination import page_info
+from src.serialization import dumps, render
+from src.singleflight import orders_flight
+from src.schemas.requests_schema import CreateOrdersRequest, OrdersRequestQueryParams, OrdersExportQueryParams
+from src.schemas.response_schema import ListOrdersResponse, CreateOrdersResponse, BulkCreateOrdersResponse, UserSummaryResponse
 
 load_dotenv()
 
@@ -17,62 +26,384 @@ router = APIRouter(
 )
 
 
+def _stock_slots(products: dict) -> dict:
+    """
+    Map the ids of products whose stock is sharded to their number of slots.
+    """
+    return {product_id: product["stock_shards"] for product_id, product in products.items() if product.get("stock_shards")}
+
+
+def _validate_order(order: CreateOrdersRequest) -> Tuple[int, List[ObjectId], List[SizesEnum]]:
+    """
+    Check an order request and return its user id and the product id and size of every item.
+    Raises HTTPException describing the first problem found.
+    """
+    if not order.userId or not order.items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid order data")
+    
+    # Validate and convert userId to int if needed
+    try:
+        user_id = int(order.userId)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="userId must be a valid integer")
+    
+    processed_items = set()  # Track processed product sizes to avoid duplicates
+    sizes = []
+    
+    for item in order.items:
+        if not item.productId or not item.qty:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid item data")
+        if not ObjectId.is_valid(str(item.productId)):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid product id {item.productId}")
+        try:
+            size = SizesEnum(str(item.size).lower())
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid size value. Must be one of: {[s.value for s in SizesEnum]}"
+            )
+        
+        # Check for duplicate product sizes in the same order
+        if (item.productId, size) in processed_items:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Duplicate product {item.productId} with size {size.value} in order")
+        if item.qty < 1:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantity must be at least 1")
+        processed_items.add((item.productId, size))
+        sizes.append(size)
+    
+    product_ids = [ObjectId(str(item.productId)) for item in order.items]
+    return user_id, product_ids, sizes
+
+
+def _build_order(order: CreateOrdersRequest, order_id: ObjectId, user_id: int, product_ids: List[ObjectId], sizes: List[SizesEnum], products: dict) -> Tuple[Orders, list]:
+    """
+    Build the order document, with name and price snapshots, and its stock reservation lines
+    from the already fetched products. Raises HTTPException for unknown products or sizes and
+    stock already known to be insufficient.
+    """
+    items = []
+    total_price = 0.0
+    for item, product_id, size in zip(order.items, product_ids, sizes):
+        product = products.get(product_id)
+        if not product:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product with id {item.productId} not found")
+        size_stock = next((entry["quantity"] for entry in product["sizes"] if entry["size"] == size.value), None)
+        if size_stock is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Size {size.value} is not available for product {item.productId}")
+        # Reject early when the stock is already known to be insufficient (sharded stock is
+        # only a rolled-up view here, so leave it to the reservation)
+        if item.qty > size_stock and not product.get("stock_shards"):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient stock for the product")
+        
+        # Create OrderItems referencing the product id, with a snapshot of its name and price
+        items.append(OrderItems(productId=product_id, size=size, quantity=item.qty, name=product["name"], price=product["price"]))
+        total_price += product["price"] * item.qty
+    
+    # Generate a default order name
+    order_name = f"Order-{user_id}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    
+    new_order = Orders(id=order_id, name=order_name, userId=user_id, items=items, total=total_price)
+    lines = [(product_id, size.value, item.qty) for item, product_id, size in zip(order.items, product_ids, sizes)]
+    return new_order, lines
+
+
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=CreateOrdersResponse)
 async def create_order(order: CreateOrdersRequest):
     """
     Create a new order.
     """
     try:
-        if not order.userId or not order.items:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid order data")
+        user_id, product_ids, sizes = _validate_order(order)
         
-        # Validate and convert userId to int if needed
-        try:
-            user_id = int(order.userId)
-        except (ValueError, TypeError):
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="userId must be a valid integer")
+        # Fetch every referenced product in a single query
+        products = {product["_id"]: product for product in await orders_repository.find_products_by_ids(list(set(product_ids)))}
         
-        items = []
-        processed_products = set()  # Track processed products to avoid duplicates
+        order_id = ObjectId()
+        new_order, lines = _build_order(order, order_id, user_id, product_ids, sizes, products)
         
-        for item in order.items:
-            if not item.productId or not item.qty:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid item data")
-            
-            # Check for duplicate products in the same order
-            if item.productId in processed_products:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Duplicate product {item.productId} in order")
-            
-            product = Products.objects(id=ObjectId(item.productId)).first()
-            if not product:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product with id {item.productId} not found")
-            if item.qty < 1:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantity must be at least 1")
-            # Check if product has sufficient stock using total_quantity
-            if item.qty > product.total_quantity:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient stock for the product")
-            
-            # Create OrderItems with the product reference (not ObjectId)
-            order_item = OrderItems(productId=product, quantity=item.qty)
-            items.append(order_item)
-            processed_products.add(item.productId)
-            
-            # Update product quantities (reduce stock)
-            product.total_quantity -= item.qty
-            product.updated_at = datetime.now()
-            product.save()
-            
-        # Generate a default order name
-        order_name = f"Order-{user_id}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        # Reserve stock for all items at once; nothing is decremented if any item falls short
+        slots_by_product = _stock_slots(products)
+        if not await orders_repository.reserve_stock(order_id, lines, slots_by_product):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient stock for the product")
         
-        new_order = Orders(name=order_name, userId=user_id, items=items)
-        new_order.save()
-        logger.info(f"Order created successfully: {new_order.id}")
-        return {"id": str(new_order.id)}
+        try:
+            await orders_repository.insert_order(new_order)
+        except Exception:
+            await orders_repository.release_stock(order_id, lines)
+            raise
+        # The order is stored: a marker left behind here is cleared by the stale reservation cleanup
+        try:
+            await orders_repository.confirm_stock(order_id, list(set(product_ids)), list(slots_by_product))
+        except Exception as e:
+            logger.error(f"Failed to clear the stock reservation of order {order_id}: {e}")
+        await _record_user_orders([new_order])
+        logger.info(f"Order created successfully: {order_id}")
+        return {"id": str(order_id)}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating order: {e}")
         raise HTTPException(status_code=500, detail="Failed to create order")
+
+
+async def _record_user_orders(orders: List[Orders]) -> None:
+    """
+    Add stored orders to their users' summaries. The orders are placed either way, so a
+    failure is only logged; `manage rebuild-user-summaries` repairs the summaries.
+    """
+    try:
+        await orders_repository.record_user_orders(orders)
+    except Exception as e:
+        logger.error(f"Failed to update user summaries for {len(orders)} order(s): {e}")
+
+
+async def _create_orders_chunk(chunk: List[Tuple[int, Any]]) -> List[dict]:
+    """
+    Validate, reserve and insert one chunk of (row, payload) orders, returning a result per
+    row: one product lookup, one reservation bulk write and one insert_many for the chunk.
+    """
+    results = []
+    candidates = []
+    for row, payload in chunk:
+        try:
+            order = CreateOrdersRequest.model_validate(payload)
+            user_id, product_ids, sizes = _validate_order(order)
+        except HTTPException as e:
+            results.append({"row": row, "status": "error", "status_code": e.status_code, "detail": e.detail})
+            continue
+        except PayloadValidationError as e:
+            results.append({"row": row, "status": "error", "status_code": 422, "detail": e.errors(include_url=False, include_context=False)})
+            continue
+        candidates.append((row, order, user_id, product_ids, sizes))
+    
+    # Fetch every product referenced by the chunk in a single query
+    all_product_ids = list({product_id for _, _, _, product_ids, _ in candidates for product_id in product_ids})
+    products = {product["_id"]: product for product in await orders_repository.find_products_by_ids(all_product_ids)} if all_product_ids else {}
     
+    built = []
+    for row, order, user_id, product_ids, sizes in candidates:
+        try:
+            new_order, lines = _build_order(order, ObjectId(), user_id, product_ids, sizes, products)
+            new_order.validate()
+        except HTTPException as e:
+            results.append({"row": row, "status": "error", "status_code": e.status_code, "detail": e.detail})
+            continue
+        except ValidationError as e:
+            results.append({"row": row, "status": "error", "status_code": status.HTTP_400_BAD_REQUEST, "detail": f"Invalid order data: {e}"})
+            continue
+        built.append((row, new_order, lines))
+    if not built:
+        return results
+    
+    # Reserve the stock of every order at once; orders that fall short are rolled back individually
+    slots_by_product = _stock_slots(products)
+    reserved = await orders_repository.reserve_stock_many([(new_order.id, lines) for _, new_order, lines in built], slots_by_product)
+    accepted = []
+    for row, new_order, lines in built:
+        if new_order.id in reserved:
+            accepted.append((row, new_order, lines))
+        else:
+            results.append({"row": row, "status": "error", "status_code": status.HTTP_400_BAD_REQUEST, "detail": "Insufficient stock for the product"})
+    if not accepted:
+        return results
+    
+    try:
+        failures = await orders_repository.insert_orders([new_order for _, new_order, _ in accepted])
+    except Exception:
+        await orders_repository.release_stock_many([(new_order.id, lines) for _, new_order, lines in accepted])
+        raise
+    # The orders are stored from here on: cleanup errors are logged, not reported as failures,
+    # and markers they leave behind are resolved by the stale reservation cleanup
+    failed = [(new_order.id, lines) for index, (_, new_order, lines) in enumerate(accepted) if index in failures]
+    try:
+        await orders_repository.release_stock_many(failed)
+    except Exception as e:
+        logger.error(f"Failed to release the stock of {len(failed)} rejected order(s): {e}")
+    stored = [new_order.id for index, (_, new_order, _) in enumerate(accepted) if index not in failures]
+    stored_product_ids = list({line[0] for index, (_, _, lines) in enumerate(accepted) if index not in failures for line in lines})
+    if stored:
+        try:
+            await orders_repository.confirm_stock_many(stored, stored_product_ids, [product_id for product_id in stored_product_ids if product_id in slots_by_product])
+        except Exception as e:
+            logger.error(f"Failed to clear the stock reservations of {len(stored)} stored order(s): {e}")
+        await _record_user_orders([new_order for index, (_, new_order, _) in enumerate(accepted) if index not in failures])
+    for index, (row, new_order, _) in enumerate(accepted):
+        if index in failures:
+            results.append({"row": row, "status": "error", "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR, "detail": failures[index]})
+        else:
+            results.append({"row": row, "status": "created", "id": str(new_order.id)})
+    return results
+
+
+@router.post("/bulk", status_code=status.HTTP_200_OK, response_model=BulkCreateOrdersResponse)
+async def bulk_create_orders(
+    orders: List[Any] = Body(..., description="CREATE ORDERS request bodies"),
+    chunk_size: int = Query(default=500, ge=1, le=5000, description="Number of orders reserved and inserted per batch"),
+):
+    """
+    Create many orders, returning a result per order. Each batch resolves its products with
+    one query, reserves stock with one bulk write and inserts the accepted orders at once;
+    an order that cannot be placed does not affect the others. A batch that fails as a whole
+    reports its rows as 500 errors, leaving the results of the other batches intact.
+    """
+    try:
+        results = []
+        rows = list(enumerate(orders))
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            try:
+                results.extend(await _create_orders_chunk(chunk))
+            except Exception as e:
+                logger.error(f"Error creating orders {chunk[0][0]}-{chunk[-1][0]}: {e}")
+                results.extend(
+                    {"row": row, "status": "error", "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR, "detail": "Failed to create order"}
+                    for row, _ in chunk
+                )
+        
+        results.sort(key=lambda result: result["row"])
+        created = sum(1 for result in results if result["status"] == "created")
+        logger.info(f"Bulk created {created} of {len(results)} orders")
+        return render({"created": created, "failed": len(results) - created, "results": results})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating orders: {e}")
+        raise HTTPException(status_code=500, detail="Failed to create orders")
+    
+
+EXPORT_CSV_COLUMNS = ["order_id", "user_id", "created_at", "product_id", "product_name", "size", "quantity", "unit_price", "order_total"]
+
+
+def _export_record(order: dict) -> dict:
+    return {
+        "id": str(order["_id"]),
+        "userId": order["userId"],
+        "created_at": order["created_at"].isoformat() if order.get("created_at") else None,
+        "total": order.get("total"),
+        "items": [{
+            "productId": str(item["productId"]),
+            "name": item.get("name"),
+            "size": item.get("size"),
+            "qty": item["quantity"],
+            "price": item.get("price"),
+        } for item in order["items"]],
+    }
+
+
+def _export_csv_rows(record: dict) -> list:
+    return [
+        [record["id"], record["userId"], record["created_at"], item["productId"], item["name"], item["size"], item["qty"], item["price"], record["total"]]
+        for item in record["items"]
+    ]
+
+
+async def _export_orders(query: dict, export_format: str, batch_size: int) -> AsyncIterator[bytes]:
+    """
+    Encode matching orders as NDJSON lines or CSV rows (one per item), flushing once per batch.
+    """
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_CSV_COLUMNS)
+    else:
+        lines = []
+    count = 0
+    async for order in orders_repository.stream_orders(query, batch_size):
+        record = _export_record(order)
+        if export_format == "csv":
+            writer.writerows(_export_csv_rows(record))
+        else:
+            lines.append(dumps(record))
+        count += 1
+        if count % batch_size == 0:
+            if export_format == "csv":
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+            else:
+                yield b"\n".join(lines) + b"\n"
+                lines = []
+    if export_format == "csv" and buffer.tell():
+        yield buffer.getvalue().encode()
+    elif export_format != "csv" and lines:
+        yield b"\n".join(lines) + b"\n"
+    logger.info(f"Exported {count} orders")
+
+
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_orders(queryParams: OrdersExportQueryParams = Query()):
+    """
+    Stream all orders of a user and/or creation time range as NDJSON or CSV.
+    Orders stored before price snapshots have empty names and prices; run the backfill first.
+    """
+    query = orders_repository.build_export_filter(user_id=queryParams.userId, start=queryParams.start, end=queryParams.end)
+    media_type = "text/csv" if queryParams.format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_orders(query, queryParams.format, queryParams.batch_size),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=orders.{queryParams.format}"},
+    )
+
+
+async def _load_orders_page(user_id: int, limit: int, offset: int, cursor: Optional[str], include_total: bool) -> dict:
+    """
+    Query one page of a user's orders and shape it as the list response.
+    Raises ValueError for an invalid cursor.
+    """
+    # Fetch the requested page, by keyset when a cursor is given
+    page = await orders_repository.find_orders_by_user(user_id, limit, offset=offset, cursor=cursor, include_total=include_total)
+    # Orders stored before price snapshots need their products resolved, all in a single query
+    product_ids = list({item["productId"] for order in page.documents if order.get("total") is None for item in order["items"]})
+    products = await orders_repository.find_products_by_ids(product_ids, projection={"name": 1, "price": 1}) if product_ids else []
+    products_by_id = {product["_id"]: product for product in products}
+    data = []
+    
+    for order in page.documents:
+        if order.get("total") is not None:
+            # Items backfilled after their product was deleted have no snapshot; hide them
+            # as the product lookup below does
+            data.append({
+                "id": str(order["_id"]),
+                "items": [{
+                    "productDetails": {"id": str(item["productId"]), "name": item["name"]},
+                    "size": item.get("size"),
+                    "qty": item["quantity"]
+                } for item in order["items"] if item.get("name") is not None],
+                "total": order["total"]
+            })
+            continue
+        
+        items = []
+        total_price = 0.0
+        
+        for item in order["items"]:
+            product = products_by_id.get(item["productId"])
+            if product:
+                product_details = {
+                    "id": str(product["_id"]),
+                    "name": product["name"]
+                }
+                items.append({
+                    "productDetails": product_details,
+                    "size": item.get("size"),
+                    "qty": item["quantity"]
+                })
+                # Calculate total price
+                total_price += product["price"] * item["quantity"]
+        
+        data.append({
+            "id": str(order["_id"]),
+            "items": items,
+            "total": total_price
+        })
+    
+    logger.info(f"Listed {len(data)} orders for user {user_id}")
+    
+    return {
+        "data": data,
+        "page": page_info(page, limit, offset=offset, cursor=cursor)
+    }
+
 
 @router.get("/{user_id}", status_code=status.HTTP_200_OK, response_model=ListOrdersResponse)
 async def list_orders_by_userId(user_id: Union[str, int] = Path(..., description="User ID"), queryParams: OrdersRequestQueryParams = Query()):
@@ -82,64 +413,50 @@ async def list_orders_by_userId(user_id: Union[str, int] = Path(..., description
     try:
         limit = queryParams.limit
         offset = queryParams.offset
+        cursor = queryParams.cursor
+        include_total = queryParams.include_total
         
         # Validate userId
         if not user_id:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User ID is required")
+        try:
+            user_id = int(user_id)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="userId must be a valid integer")
         
-        # Start with orders for the specific user
-        query = Orders.objects(userId=user_id)
-        
-        # Get total count before pagination
-        total_count = query.count()
-        
-        # Apply pagination
-        paginated_query = query.skip(offset).limit(limit)
-        
-        # Execute query and build response
-        orders = paginated_query
-        data = []
-        
-        for order in orders:
-            items = []
-            total_price = 0.0
-            
-            for item in order.items:
-                # Get product details - item.productId is already a reference
-                product = item.productId
-                if product:
-                    product_details = {
-                        "id": str(product.id),
-                        "name": product.name
-                    }
-                    items.append({
-                        "productDetails": product_details,
-                        "qty": item.quantity
-                    })
-                    # Calculate total price
-                    total_price += product.price * item.quantity
-            
-            data.append({
-                "id": str(order.id),
-                "items": items,
-                "total": total_price
-            })
-        
-        # Calculate pagination info
-        next_offset = offset + limit if (offset + limit) < total_count else None
-        previous_offset = offset - limit if offset > 0 else None
-        
-        logger.info(f"Listed {len(data)} orders for user {user_id}")
-        
-        return {
-            "data": data,
-            "page": {
-                "next": next_offset,
-                "limit": limit,
-                "previous": previous_offset
-            }
-        }
+        # Identical queries arriving while one is running share its result
+        flight_key = f"{user_id}:{limit}:{0 if cursor else offset}:{cursor}:{include_total}"
+        try:
+            response = await orders_flight.do(flight_key, lambda: _load_orders_page(user_id, limit, offset, cursor, include_total))
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+        # Rows are built from projected fields in the response shape, so skip response_model re-validation
+        return render(response)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing orders for user {user_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to list orders")
+
+
+@router.get("/{user_id}/summary", status_code=status.HTTP_200_OK, response_model=UserSummaryResponse)
+async def get_user_summary(user_id: int = Path(..., description="User ID")):
+    """
+    Return a user's order count, lifetime spend and last order time.
+    """
+    try:
+        summary = await orders_repository.find_user_summary(user_id)
+        if summary is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No orders found for the user")
+        return {
+            "userId": summary["_id"],
+            "order_count": summary["order_count"],
+            "total_spent": summary["total_spent"],
+            "last_order_at": summary.get("last_order_at"),
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading the order summary of user {user_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to read the user summary")
@@ -1,9 +1,18 @@
-from fastapi import APIRouter, status, HTTPException, Query
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi import APIRouter, status, HTTPException, Header, Path, Query, Request, Response
 from loguru import logger
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from dotenv import load_dotenv
-from src.models.products import Products
-from src.schemas.requests_schema import CreateProductsRequest, ProductsRequestQueryParams, ProductSizes
-from src.schemas.response_schema import ListProductsResponse, CreateProductsResponse
+from src.cache import catalog_changed, catalog_version, products_cache
+from src.models.products import Products, Sizes, SizesEnum
+from src.repositories import products as products_repository
+from src.repositories import stock_shards as stock_shards_repository
+from src.repositories.pagination import page_info
+from src.serialization import loads, render
+from src.singleflight import products_flight
+from src.schemas.requests_schema import CreateProductsRequest, ProductsRequestQueryParams, ProductSizes, StockShardsRequest
+from src.schemas.response_schema import ListProductsResponse, CreateProductsResponse, BulkCreateProductsResponse, StockShardsResponse
 
 load_dotenv()
 
@@ -13,6 +22,38 @@ router = APIRouter(
 )
 
 
+def _build_sizes(sizes: List[ProductSizes]) -> Tuple[list, int]:
+    """
+    Convert requested sizes into Sizes documents and their total quantity.
+    Raises ValueError for unknown sizes or negative quantities.
+    """
+    validated_sizes = []
+    total_quantity = 0
+    
+    for size_data in sizes:
+        # Validate size enum
+        size_enum = SizesEnum(str(size_data.size).lower())
+        quantity = int(size_data.quantity)
+        
+        if quantity < 0:
+            raise ValueError("Quantity must be non-negative")
+        
+        validated_sizes.append(Sizes(size=size_enum, quantity=quantity))
+        total_quantity += quantity
+    return validated_sizes, total_quantity
+
+
+async def _catalog_changed() -> None:
+    """
+    Bump the catalog version after products were stored. The products exist either way, so
+    a failure is only logged; listings may show the previous version until the next change.
+    """
+    try:
+        await catalog_changed()
+    except Exception as e:
+        logger.error(f"Failed to bump the catalog version: {e}")
+
+
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=CreateProductsResponse)
 async def create_product(product: CreateProductsRequest):
     """
@@ -24,20 +65,7 @@ async def create_product(product: CreateProductsRequest):
         
         # Validate sizes data
         try:
-            from src.models.products import Sizes, SizesEnum
-            validated_sizes = []
-            total_quantity = 0
-            
-            for size_data in product.sizes:
-                # Validate size enum
-                size_enum = SizesEnum(str(size_data.size).lower())
-                quantity = int(size_data.quantity)
-                
-                if quantity < 0:
-                    raise ValueError("Quantity must be non-negative")
-                
-                validated_sizes.append(Sizes(size=size_enum, quantity=quantity))
-                total_quantity += quantity
+            validated_sizes, total_quantity = _build_sizes(product.sizes)
         except (ValueError, AttributeError) as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, 
@@ -45,84 +73,263 @@ async def create_product(product: CreateProductsRequest):
             )
         
         # Check for existing product (case-insensitive)
-        is_product_exists = Products.objects(name__iexact=product.name).first()
+        is_product_exists = await products_repository.find_product_by_name(product.name)
         if is_product_exists:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Product with this name already exists")
         
         new_product = Products(name=product.name, price=product.price, sizes=validated_sizes, total_quantity=total_quantity)
-        new_product.save()
-        logger.info(f"Product created successfully: {new_product.id}")
-        return {"id": str(new_product.id)}
+        try:
+            product_id = await products_repository.insert_product(new_product)
+        except DuplicateKeyError:
+            # Created concurrently under the same name (in any case) after the check above
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Product with this name already exists")
+        await _catalog_changed()
+        logger.info(f"Product created successfully: {product_id}")
+        return {"id": str(product_id)}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating product: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create product")
     
     
+async def _load_products_page(name: Optional[str], search: str, size: Optional[str], in_stock: bool, limit: int, offset: int, cursor: Optional[str], include_total: bool, cache_key: str) -> dict:
+    """
+    Query one page of products, shape it as the list response and cache it.
+    Raises ValueError for an invalid cursor.
+    """
+    # Filter by name (partial, prefix or word matching, ignoring case), size and availability
+    query = products_repository.build_products_filter(name=name, size=size, search=search, in_stock=in_stock)
+    
+    # Fetch the requested page, by keyset when a cursor is given
+    page = await products_repository.find_products(query, limit, offset=offset, cursor=cursor, include_total=include_total)
+    data = []
+    
+    for product in page.documents:
+        data.append({
+            "id": str(product["_id"]),
+            "name": product["name"],
+            "price": product["price"]
+        })
+    
+    logger.info(f"Listed {len(data)} products with filters: name={name}, search={search}, size={size}, in_stock={in_stock}")
+    
+    response = {
+        "data": data,
+        "page": page_info(page, limit, offset=offset, cursor=cursor)
+    }
+    await products_cache.set(cache_key, response)
+    return response
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against an ETag.
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag.removeprefix("W/") for candidate in candidates)
+
+
 @router.get("/", status_code=status.HTTP_200_OK, response_model=ListProductsResponse)
-async def list_products(queryParams: ProductsRequestQueryParams = Query()):
+async def list_products(queryParams: ProductsRequestQueryParams = Query(), if_none_match: Optional[str] = Header(default=None)):
     """
-    List products with optional filtering by name and size.
+    List products with optional filtering by name, size and availability.
+    Listings carry an ETag of the catalog version; If-None-Match answers 304 while it is unchanged.
     """
     try:
         name = queryParams.name
+        search = queryParams.search
         size = queryParams.size
+        in_stock = queryParams.in_stock
         limit = queryParams.limit
         offset = queryParams.offset
+        cursor = queryParams.cursor
+        include_total = queryParams.include_total
 
-        # Start with all products
-        query = Products.objects.all()
-        
-        # Apply name filter if provided (case-insensitive partial matching)
-        if name:
-            query = query.filter(name__icontains=name)
-        
         # Apply size filter if provided
+        size_value = None
         if size:
             # Validate size enum value
             try:
-                from src.models.products import SizesEnum
-                size_enum = SizesEnum(str(size).lower())
-                # Filter products that have the specified size in their sizes list
-                query = query.filter(__raw__={"sizes": {"$elemMatch": {"size": size_enum.value}}})
+                size_value = SizesEnum(str(size).lower()).value
             except ValueError:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST, 
                     detail=f"Invalid size value. Must be one of: {[s.value for s in SizesEnum]}"
                 )
         
-        # Get total count before pagination
-        total_count = query.count()
-        
-        # Apply pagination
-        paginated_query = query.skip(offset).limit(limit)
-        
-        # Execute query and build response
-        products = paginated_query
-        data = []
+        # Nothing changed since the client's copy: answer before querying the page
+        version = await catalog_version.get()
+        headers = {"ETag": f'W/"catalog-{version}"', "Cache-Control": "no-cache"}
+        if _etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
         
-        for product in products:
-            data.append({
-                "id": str(product.id),
-                "name": product.name,
-                "price": product.price
-            })
+        # Serve from the response cache when the same normalized query was answered recently
+        # at this catalog version
+        cache_key = products_cache.key_for({
+            "version": version,
+            "name": name.lower() if name else None,
+            "search": search if name else None,
+            "size": size_value,
+            "in_stock": in_stock,
+            "limit": limit,
+            "offset": 0 if cursor else offset,
+            "cursor": cursor,
+            "include_total": include_total,
+        })
+        cached = await products_cache.get(cache_key)
+        if cached is not None:
+            return render(cached, headers=headers)
         
-        # Calculate pagination info
-        next_offset = offset + limit if (offset + limit) < total_count else None
-        previous_offset = offset - limit if offset > 0 else None
-        
-        logger.info(f"Listed {len(data)} products with filters: name={name}, size={size}")
-        
-        return {
-            "data": data,
-            "page": {
-                "next": next_offset,
-                "limit": limit,
-                "previous": previous_offset
-            }
-        }
+        # Identical queries arriving while one is running share its result
+        try:
+            response = await products_flight.do(cache_key, lambda: _load_products_page(name, search, size_value, in_stock, limit, offset, cursor, include_total, cache_key))
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+        # Rows are built from projected fields in the response shape, so skip response_model re-validation
+        return render(response, headers=headers)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing products: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to list products")
-    
\ No newline at end of file
+    
+
+async def _read_records(request: Request) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Yield (row, record, error) for every record of an NDJSON body, parsed as it streams in,
+    or of a JSON array body.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        row = 0
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    try:
+                        yield row, loads(line), None
+                    except ValueError as e:
+                        yield row, None, f"Invalid JSON: {e}"
+                    row += 1
+        if buffer.strip():
+            try:
+                yield row, loads(buffer), None
+            except ValueError as e:
+                yield row, None, f"Invalid JSON: {e}"
+        return
+    
+    try:
+        records = loads(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON: {e}")
+    if not isinstance(records, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array or NDJSON of products")
+    for row, record in enumerate(records):
+        yield row, record, None
+
+
+async def _import_chunk(chunk: list, seen_names: set) -> List[dict]:
+    """
+    Validate, deduplicate and insert one chunk of (row, record, error) tuples, returning a
+    result per row. Names already imported earlier in the request are tracked in seen_names.
+    """
+    results = []
+    candidates = []
+    for row, record, error in chunk:
+        if error:
+            results.append({"row": row, "status": "error", "detail": error})
+            continue
+        try:
+            payload = CreateProductsRequest.model_validate(record)
+            validated_sizes, total_quantity = _build_sizes(payload.sizes)
+            product = Products(name=payload.name, price=payload.price, sizes=validated_sizes, total_quantity=total_quantity)
+            product.validate()
+        except Exception as e:
+            results.append({"row": row, "status": "error", "detail": f"Invalid product data: {e}"})
+            continue
+        if payload.name.lower() in seen_names:
+            results.append({"row": row, "status": "error", "detail": "Duplicate product name in import"})
+            continue
+        seen_names.add(payload.name.lower())
+        candidates.append((row, product))
+    
+    # One lookup for the names of the whole chunk
+    existing = await products_repository.find_existing_names([product.name for _, product in candidates])
+    to_insert = []
+    for row, product in candidates:
+        if product.name.lower() in existing:
+            results.append({"row": row, "status": "error", "detail": "Product with this name already exists"})
+        else:
+            to_insert.append((row, product))
+    
+    if to_insert:
+        inserted_ids, failures = await products_repository.insert_products([product for _, product in to_insert])
+        for index, (row, _) in enumerate(to_insert):
+            if index in failures:
+                results.append({"row": row, "status": "error", "detail": failures[index]})
+            else:
+                results.append({"row": row, "status": "created", "id": str(inserted_ids[index])})
+    return results
+
+
+@router.post("/bulk", status_code=status.HTTP_200_OK, response_model=BulkCreateProductsResponse)
+async def bulk_create_products(request: Request, chunk_size: int = Query(default=1000, ge=1, le=10000, description="Number of records validated and inserted per batch")):
+    """
+    Import many products from an NDJSON stream (Content-Type: application/x-ndjson) or a JSON
+    array of product records, returning a result per record.
+    """
+    try:
+        results = []
+        seen_names = set()
+        chunk = []
+        async for record in _read_records(request):
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                results.extend(await _import_chunk(chunk, seen_names))
+                chunk = []
+        if chunk:
+            results.extend(await _import_chunk(chunk, seen_names))
+        
+        results.sort(key=lambda result: result["row"])
+        created = sum(1 for result in results if result["status"] == "created")
+        if created:
+            await _catalog_changed()
+        logger.info(f"Bulk imported {created} of {len(results)} products")
+        return render({"created": created, "failed": len(results) - created, "results": results})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing products: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to import products")
+
+
+@router.post("/{product_id}/stock-shards", status_code=status.HTTP_200_OK, response_model=StockShardsResponse)
+async def enable_stock_shards(body: StockShardsRequest, product_id: str = Path(..., description="Product ID")):
+    """
+    Split a hot product's stock across counter slots so concurrent orders update different
+    documents. Its sizes and total_quantity then become a periodically rolled-up view.
+    """
+    try:
+        if not ObjectId.is_valid(product_id):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid product id {product_id}")
+        product = await stock_shards_repository.enable_stock_shards(ObjectId(product_id), body.shards)
+        if product is None:
+            existing = await products_repository.find_product_by_id(ObjectId(product_id), projection={"stock_shards": 1})
+            if not existing:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product with id {product_id} not found")
+            if existing.get("stock_shards"):
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Product stock is already sharded")
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Product has orders in progress, retry shortly")
+        logger.info(f"Sharded stock of product {product_id} across {body.shards} slots")
+        return {"id": product_id, "shards": body.shards}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error sharding product stock: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to shard product stock")
@@ -1,14 +1,19 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Dict, Optional, Any, Union
+from typing import List, Dict, Optional, Any, Union, Literal
+from datetime import datetime
 
 
 class ProductsRequestQueryParams(BaseModel):
     model_config = ConfigDict(extra="forbid")
     
     name: Optional[str] = Field(default=None, description="Name of the product")
+    search: Optional[Literal["contains", "prefix", "token"]] = Field(default="contains", description="How name is matched: anywhere in the name, as a name prefix, or as whole words")
     size: Optional[Union[str, int]] = Field(default=None, description="Size of the product")
-    limit: Optional[int] = Field(default=10, description="Number of items to return per page")
-    offset: Optional[int] = Field(default=0, description="Number of items to skip for pagination")
+    in_stock: Optional[bool] = Field(default=False, description="Only products with stock left (in the given size, if any)")
+    limit: Optional[int] = Field(default=10, ge=1, le=100, description="Number of items to return per page")
+    offset: Optional[int] = Field(default=0, ge=0, description="Number of items to skip for pagination")
+    cursor: Optional[str] = Field(default=None, description="Cursor from a previous page; switches to keyset pagination and ignores offset")
+    include_total: Optional[bool] = Field(default=True, description="Whether to count all matching items")
 
 class ProductSizes(BaseModel):
     model_config = ConfigDict(extra="forbid")
@@ -23,24 +28,44 @@ class CreateProductsRequest(BaseModel):
     name: str = Field(..., description="Name of the product")
     price: float = Field(..., description="Price of the product")
     sizes: List[ProductSizes] = Field(..., description="List of sizes and their quantities")
+
+
+class StockShardsRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    
+    shards: int = Field(..., ge=2, le=64, description="Number of counter slots each size's stock is split across")
     
     
 class OrdersRequestQueryParams(BaseModel):
     model_config = ConfigDict(extra="forbid")
     
-    limit: Optional[int] = Field(default=10, description="Number of items to return per page")
-    offset: Optional[int] = Field(default=0, description="Number of items to skip for pagination")
+    limit: Optional[int] = Field(default=10, ge=1, le=100, description="Number of items to return per page")
+    offset: Optional[int] = Field(default=0, ge=0, description="Number of items to skip for pagination")
+    cursor: Optional[str] = Field(default=None, description="Cursor from a previous page; switches to keyset pagination and ignores offset")
+    include_total: Optional[bool] = Field(default=True, description="Whether to count all matching items")
+    
+
+
+class OrdersExportQueryParams(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    
+    format: Literal["ndjson", "csv"] = Field(default="ndjson", description="Export format")
+    userId: Optional[int] = Field(default=None, description="Only export orders of this user")
+    start: Optional[datetime] = Field(default=None, description="Only export orders created at or after this time")
+    end: Optional[datetime] = Field(default=None, description="Only export orders created before this time")
+    batch_size: int = Field(default=1000, ge=1, le=10000, description="Number of orders fetched per database round trip")
     
    
 class OrderItems(BaseModel):
     model_config = ConfigDict(extra="forbid")
     
     productId: Union[str, int] = Field(..., description="ID of the product")
+    size: Union[str, int] = Field(..., description="Size of the product")
     qty: int = Field(..., description="Quantity of the product")
     
 class CreateOrdersRequest(BaseModel):
     model_config = ConfigDict(extra="forbid")
     
     userId: Union[int, str] = Field(..., description="ID of the user placing the order")
-    items: List[OrderItems] = Field(..., description="List of items in the order with product IDs and quantities")
+    items: List[OrderItems] = Field(..., description="List of items in the order with product IDs, sizes and quantities")
     
\ No newline at end of file
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Union
+from typing import Any, List, Optional, Union
+from datetime import datetime
 
 
 class CreateProductsResponse(BaseModel):
@@ -8,6 +9,48 @@ class CreateProductsResponse(BaseModel):
     id: Union[str, int] = Field(..., description="ID of the created product")
     
     
+class StockShardsResponse(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    
+    id: Union[str, int] = Field(..., description="ID of the product")
+    shards: int = Field(..., description="Number of counter slots per size")
+
+
+class BulkProductResult(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    
+    row: int = Field(..., description="Position of the record in the import, starting at 0")
+    status: str = Field(..., description="created or error")
+    id: Optional[Union[str, int]] = Field(None, description="ID of the created product")
+    detail: Optional[str] = Field(None, description="Why the record was rejected")
+
+
+class BulkCreateProductsResponse(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    
+    created: int = Field(..., description="Number of products created")
+    failed: int = Field(..., description="Number of records rejected")
+    results: List[BulkProductResult] = Field(..., description="Result of every record")
+    
+    
+class BulkOrderResult(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    
+    row: int = Field(..., description="Position of the order in the request, starting at 0")
+    status: str = Field(..., description="created or error")
+    id: Optional[Union[str, int]] = Field(None, description="ID of the created order")
+    status_code: Optional[int] = Field(None, description="HTTP status the order would have got from POST /orders")
+    detail: Optional[Any] = Field(None, description="Why the order was rejected")
+
+
+class BulkCreateOrdersResponse(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    
+    created: int = Field(..., description="Number of orders created")
+    failed: int = Field(..., description="Number of orders rejected")
+    results: List[BulkOrderResult] = Field(..., description="Result of every order")
+
+
 class CreateOrdersResponse(BaseModel):
     model_config = ConfigDict(extra="forbid")
     
@@ -20,6 +63,9 @@ class PageInfo(BaseModel):
     next: Optional[int] = Field(None, description="Next offset value")
     limit: int = Field(..., description="Current limit value")
     previous: Optional[int] = Field(None, description="Previous offset value")
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page")
+    previous_cursor: Optional[str] = Field(None, description="Cursor of the previous page")
+    total: Optional[int] = Field(None, description="Total number of matching items, if requested")
 
 
 class ProductItem(BaseModel):
@@ -48,6 +94,7 @@ class OrderItem(BaseModel):
     model_config = ConfigDict(extra="forbid")
     
     productDetails: ProductDetails = Field(..., description="Product details")
+    size: Optional[str] = Field(None, description="Size of the product")
     qty: int = Field(..., description="Quantity of the product")
 
 
@@ -63,4 +110,12 @@ class ListOrdersResponse(BaseModel):
     model_config = ConfigDict(extra="forbid")
     
     data: List[OrderData] = Field(..., description="List of orders")
-    page: PageInfo = Field(..., description="Pagination information")
\ No newline at end of file
+    page: PageInfo = Field(..., description="Pagination information")
+
+class UserSummaryResponse(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    
+    userId: int = Field(..., description="User ID")
+    order_count: int = Field(..., description="Number of orders placed by the user")
+    total_spent: float = Field(..., description="Sum of the user's order totals")
+    last_order_at: Optional[datetime] = Field(None, description="When the user's latest order was placed")
@@ -0,0 +1,52 @@
+import json
+import os
+from typing import Any, Optional
+from dotenv import load_dotenv
+from fastapi.responses import JSONResponse, Response
+from loguru import logger
+
+try:
+    import orjson
+except ImportError:  # orjson is only needed for the fast mode
+    orjson = None
+
+load_dotenv()
+
+# Opt-in orjson encoding for every JSON response
+FAST_JSON = (os.environ.get("FAST_JSON") or "false").lower() == "true"
+if FAST_JSON and orjson is None:
+    logger.warning("FAST_JSON is enabled but orjson is not installed; using the standard JSON encoder")
+    FAST_JSON = False
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+ResponseClass = ORJSONResponse if FAST_JSON else JSONResponse
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode content to JSON bytes with the configured encoder.
+    """
+    if FAST_JSON:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content).encode()
+
+
+def loads(data: Any) -> Any:
+    """
+    Decode JSON text or bytes with the configured decoder. Raises ValueError on invalid input.
+    """
+    if FAST_JSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def render(content: Any, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    """
+    Return already shaped response data as JSON, bypassing response_model re-validation.
+    """
+    return ResponseClass(content=content, status_code=status_code, headers=headers)
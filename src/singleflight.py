@@ -0,0 +1,62 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict
+from dotenv import load_dotenv
+from src.metrics import Counter, registry
+
+load_dotenv()
+
+# Collapse identical concurrent list queries into one backend call
+SINGLEFLIGHT_ENABLED = (os.environ.get("SINGLEFLIGHT_ENABLED") or "true").lower() == "true"
+
+singleflight_calls_total = registry.register(Counter(
+    "singleflight_calls_total", "Backend calls made by single-flight groups.", ("group",),
+))
+singleflight_coalesced_total = registry.register(Counter(
+    "singleflight_coalesced_total", "Requests served by joining an identical call already in flight.", ("group",),
+))
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time: callers arriving while a call for the same
+    key is in flight wait for it and share its result (or exception).
+
+    The call runs in its own task, so a caller that disconnects does not cancel it for
+    the others.
+    """
+
+    def __init__(self, name: str, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await call()
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.calls += 1
+            singleflight_calls_total.inc(self.name)
+        else:
+            self.coalesced += 1
+            singleflight_coalesced_total.inc(self.name)
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved when every waiter went away
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._in_flight)}
+
+
+products_flight = SingleFlight("products", enabled=SINGLEFLIGHT_ENABLED)
+orders_flight = SingleFlight("orders", enabled=SINGLEFLIGHT_ENABLED)
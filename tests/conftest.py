@@ -0,0 +1,63 @@
+import httpx
+import mongomock_motor
+import pytest
+from bson import ObjectId
+from loguru import logger
+from src import db
+from src.cache import catalog_version, products_cache
+from src.main import app
+
+# Keep test runs out of the log files the app writes to
+logger.remove()
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def database():
+    """
+    A fresh in-memory database per test, installed where get_database() looks for it.
+    """
+    client = mongomock_motor.AsyncMongoMockClient()
+    db._client = client
+    db._database = client["test"]
+    await products_cache.invalidate()
+    catalog_version._value = None
+    yield db._database
+    db._client = None
+    db._database = None
+
+
+@pytest.fixture
+async def client(database):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def create_product(client):
+    async def create(name: str, quantity: int = 10, size: str = "md", price: float = 10.0) -> str:
+        response = await client.post("/products/", json={"name": name, "price": price, "sizes": [{"size": size, "quantity": quantity}]})
+        assert response.status_code == 201, response.text
+        return response.json()["id"]
+    return create
+
+
+@pytest.fixture
+def place_order(client):
+    async def place(user_id: int, *items):
+        """
+        POST an order of (product id, quantity) items in size md.
+        """
+        return await client.post("/orders/", json={"userId": user_id, "items": [{"productId": product_id, "size": "md", "qty": qty} for product_id, qty in items]})
+    return place
+
+
+@pytest.fixture
+def product(database):
+    async def find(product_id) -> dict:
+        return await database["products"].find_one({"_id": ObjectId(product_id)})
+    return find
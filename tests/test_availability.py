@@ -0,0 +1,36 @@
+import pytest
+from bson import ObjectId
+from src.repositories import orders as orders_repository
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_in_stock_filter_hides_sold_out_products(client, create_product, place_order, product):
+    await create_product("Shirt", quantity=1)
+    sold_out = await create_product("Hat", quantity=1)
+    assert (await place_order(1, (sold_out, 1))).status_code == 201
+    assert (await product(sold_out))["in_stock_sizes"] == []
+    
+    body = (await client.get("/products/", params={"in_stock": True})).json()
+    assert [item["name"] for item in body["data"]] == ["Shirt"]
+    assert body["page"]["total"] == 1
+    body = (await client.get("/products/")).json()
+    assert body["page"]["total"] == 2
+
+
+async def test_in_stock_filter_by_size(client, create_product):
+    await create_product("Shirt", quantity=1, size="md")
+    await create_product("Hat", quantity=1, size="lg")
+    
+    body = (await client.get("/products/", params={"in_stock": True, "size": "lg"})).json()
+    assert [item["name"] for item in body["data"]] == ["Hat"]
+
+
+async def test_cancelled_reservation_restores_availability(create_product, product):
+    product_id = ObjectId(await create_product("Hat", quantity=1))
+    order_id = ObjectId()
+    
+    assert await orders_repository.reserve_stock(order_id, [(product_id, "md", 1)])
+    assert (await product(product_id))["in_stock_sizes"] == []
+    await orders_repository.release_stock(order_id, [(product_id, "md", 1)])
+    assert (await product(product_id))["in_stock_sizes"] == ["md"]
@@ -0,0 +1,63 @@
+import pytest
+from bson import ObjectId
+from src.repositories import orders as orders_repository
+
+pytestmark = pytest.mark.anyio
+
+
+def _order(user_id: int, *items) -> dict:
+    return {"userId": user_id, "items": [{"productId": product_id, "size": "md", "qty": qty} for product_id, qty in items]}
+
+
+async def test_bulk_orders_report_a_result_per_row(client, create_product, product):
+    shirt = await create_product("Shirt", quantity=5)
+    hat = await create_product("Hat", quantity=1)
+    
+    response = await client.post("/orders/bulk", json=[
+        _order(1, (shirt, 2)),
+        _order(2, (shirt, 1), (hat, 2)),
+        {"userId": 3},
+        _order(4, (str(ObjectId()), 1)),
+    ])
+    
+    assert response.status_code == 200
+    body = response.json()
+    assert body["created"] == 1
+    assert [result["status_code"] if result["status"] == "error" else 201 for result in body["results"]] == [201, 400, 422, 404]
+    stored = await product(shirt)
+    assert stored["sizes"][0]["quantity"] == 3
+    assert stored["reservations"] == []
+    assert (await product(hat))["sizes"][0]["quantity"] == 1
+
+
+async def test_bulk_chunk_failure_only_fails_its_rows(client, database, create_product, product, monkeypatch):
+    product_id = await create_product("Shirt", quantity=10)
+    reserve_stock_many = orders_repository.reserve_stock_many
+    calls = 0
+    
+    async def flaky_reserve_stock_many(*args):
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise RuntimeError("write failed")
+        return await reserve_stock_many(*args)
+    monkeypatch.setattr(orders_repository, "reserve_stock_many", flaky_reserve_stock_many)
+    response = await client.post("/orders/bulk?chunk_size=2", json=[_order(user_id, (product_id, 1)) for user_id in range(1, 7)])
+    
+    body = response.json()
+    assert [result["status"] for result in body["results"]] == ["created", "created", "error", "error", "created", "created"]
+    assert [result.get("status_code") for result in body["results"][2:4]] == [500, 500]
+    assert await database["orders"].count_documents({}) == 4
+    assert (await product(product_id))["sizes"][0]["quantity"] == 6
+
+
+async def test_bulk_cleanup_failure_keeps_stored_orders(client, database, create_product, monkeypatch):
+    product_id = await create_product("Shirt", quantity=10)
+    
+    async def confirm_stock_many(*args):
+        raise RuntimeError("write failed")
+    monkeypatch.setattr(orders_repository, "confirm_stock_many", confirm_stock_many)
+    response = await client.post("/orders/bulk", json=[_order(1, (product_id, 1)), _order(2, (product_id, 1))])
+    
+    assert response.json()["created"] == 2
+    assert await database["orders"].count_documents({}) == 2
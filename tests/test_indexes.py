@@ -0,0 +1,69 @@
+import os
+import uuid
+import httpx
+import pytest
+from mongoengine import DEFAULT_CONNECTION_NAME, disconnect
+from pymongo.errors import DuplicateKeyError
+from pymongo.uri_parser import parse_uri
+from src import db
+from src.main import app
+from src.manage import check_query_plans
+from src.models.products import Products, Sizes
+from src.repositories import products as products_repository
+
+# Explain plans and collations need a real server; mongomock ignores both
+MONGODB_URI = os.environ.get("MONGODB_URI")
+
+pytestmark = [
+    pytest.mark.anyio,
+    pytest.mark.skipif(not MONGODB_URI, reason="needs a MongoDB server in MONGODB_URI"),
+]
+
+
+@pytest.fixture
+async def mongodb(monkeypatch):
+    """
+    A throwaway database on the MONGODB_URI server, with the declared indexes synced.
+    """
+    if parse_uri(MONGODB_URI)["database"]:
+        pytest.skip("MONGODB_URI names a database; the tests create and drop their own")
+    name = f"test_{uuid.uuid4().hex}"
+    monkeypatch.setenv("DB_NAME", name)
+    db.connect_db()
+    assert db._database.name == name
+    try:
+        yield db._database
+    finally:
+        await db._client.drop_database(name)
+        db._client.close()
+        disconnect(DEFAULT_CONNECTION_NAME)
+        db._client = None
+        db._database = None
+
+
+def _product(name: str) -> Products:
+    return Products(name=name, price=10.0, sizes=[Sizes(size="md", quantity=1)], total_quantity=1)
+
+
+async def test_declared_indexes_are_in_sync(mongodb):
+    report = db.sync_indexes()
+    
+    assert all(entry == {"missing": [], "extra": []} for entry in report.values()), report
+
+
+async def test_router_queries_use_indexes(mongodb):
+    assert await check_query_plans()
+
+
+async def test_product_names_are_unique_regardless_of_case(mongodb):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        body = {"price": 10, "sizes": [{"size": "md", "quantity": 1}]}
+        assert (await client.post("/products/", json={"name": "Blue Shirt", **body})).status_code == 201
+        assert (await client.post("/products/", json={"name": "BLUE SHIRT", **body})).status_code == 400
+    
+    # The index rejects the duplicate even when the name check is skipped, as under a race
+    with pytest.raises(DuplicateKeyError):
+        await products_repository.insert_product(_product("blue shirt"))
+    _, failures = await products_repository.insert_products([_product("Red Hat"), _product("RED HAT")])
+    assert failures == {1: "Product with this name already exists"}
+    assert await mongodb["products"].count_documents({}) == 2
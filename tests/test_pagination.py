@@ -0,0 +1,54 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def orders(create_product, place_order):
+    product_id = await create_product("Shirt", quantity=100)
+    return [(await place_order(7, (product_id, 1))).json()["id"] for _ in range(5)]
+
+
+async def test_offset_pages(client, orders):
+    response = await client.get("/orders/7", params={"limit": 2, "offset": 2})
+    
+    body = response.json()
+    assert [order["id"] for order in body["data"]] == orders[2:4]
+    assert body["page"]["next"] == 4
+    assert body["page"]["previous"] == 0
+    assert body["page"]["total"] == 5
+
+
+async def test_previous_offset_is_never_negative(client, orders):
+    body = (await client.get("/orders/7", params={"limit": 10, "offset": 3})).json()
+    
+    assert [order["id"] for order in body["data"]] == orders[3:]
+    assert body["page"]["previous"] == 0
+
+
+async def test_cursor_pages_walk_every_order_once(client, orders):
+    seen = []
+    params = {"limit": 2}
+    while True:
+        body = (await client.get("/orders/7", params=params)).json()
+        seen.extend(order["id"] for order in body["data"])
+        if not body["page"]["next_cursor"]:
+            break
+        params = {"limit": 2, "cursor": body["page"]["next_cursor"]}
+    assert seen == orders
+    
+    # The previous cursor of the last page leads back to the page before it
+    body = (await client.get("/orders/7", params={"limit": 2, "cursor": body["page"]["previous_cursor"]})).json()
+    assert [order["id"] for order in body["data"]] == orders[2:4]
+
+
+async def test_invalid_cursor_is_rejected(client, orders):
+    response = await client.get("/orders/7", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("path", ["/orders/7", "/products/"])
+@pytest.mark.parametrize("params", [{"limit": 0}, {"limit": 101}, {"offset": -1}])
+async def test_out_of_range_pagination_is_rejected(client, path, params):
+    response = await client.get(path, params=params)
+    assert response.status_code == 422
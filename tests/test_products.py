@@ -0,0 +1,39 @@
+import pytest
+from src.routers import products as products_router
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def failing_catalog_changed(monkeypatch):
+    async def catalog_changed():
+        raise RuntimeError("write failed")
+    monkeypatch.setattr(products_router, "catalog_changed", catalog_changed)
+
+
+async def test_listing_etag_changes_with_the_catalog(client, create_product):
+    await create_product("Shirt")
+    response = await client.get("/products/")
+    etag = response.headers["etag"]
+    
+    assert (await client.get("/products/", headers={"If-None-Match": etag})).status_code == 304
+    await create_product("Hat")
+    response = await client.get("/products/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+async def test_version_bump_failure_keeps_the_created_product(client, database, failing_catalog_changed):
+    response = await client.post("/products/", json={"name": "Shirt", "price": 10, "sizes": [{"size": "md", "quantity": 1}]})
+    
+    assert response.status_code == 201
+    assert await database["products"].count_documents({}) == 1
+
+
+async def test_version_bump_failure_keeps_bulk_results(client, database, failing_catalog_changed):
+    records = [{"name": f"Shirt {index}", "price": 10, "sizes": [{"size": "md", "quantity": 1}]} for index in range(3)]
+    response = await client.post("/products/bulk", json=records)
+    
+    assert response.status_code == 200
+    assert response.json()["created"] == 3
+    assert await database["products"].count_documents({}) == 3
@@ -0,0 +1,83 @@
+import httpx
+import pytest
+from loguru import logger
+from starlette.responses import PlainTextResponse
+from src.middleware.request_logging import REQUEST_ID_HEADER, RequestLoggingMiddleware
+
+pytestmark = pytest.mark.anyio
+
+
+async def endpoint(scope, receive, send):
+    if scope["path"] == "/boom":
+        raise RuntimeError("boom")
+    status_code = {"/missing": 404, "/broken": 500}.get(scope["path"], 200)
+    await PlainTextResponse("body", status_code=status_code)(scope, receive, send)
+
+
+@pytest.fixture
+def records():
+    records = []
+    handler_id = logger.add(lambda message: records.append(message.record), level="DEBUG")
+    yield records
+    logger.remove(handler_id)
+
+
+def _client(sample_rate: float) -> httpx.AsyncClient:
+    app = RequestLoggingMiddleware(endpoint, sample_rate=sample_rate)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def test_one_record_per_request(records):
+    async with _client(sample_rate=1.0) as client:
+        response = await client.get("/items")
+    
+    assert response.status_code == 200
+    [record] = records
+    assert record["level"].name == "INFO"
+    assert {key: record["extra"][key] for key in ("method", "path", "status")} == {"method": "GET", "path": "/items", "status": 200}
+    assert record["extra"]["latency_ms"] >= 0
+
+
+async def test_successful_requests_are_sampled(records):
+    async with _client(sample_rate=0) as client:
+        response = await client.get("/items")
+    
+    assert response.status_code == 200
+    assert records == []
+
+
+async def test_errors_are_always_logged(records):
+    async with _client(sample_rate=0) as client:
+        assert (await client.get("/missing")).status_code == 404
+        assert (await client.get("/broken")).status_code == 500
+    
+    assert [(record["extra"]["status"], record["level"].name) for record in records] == [(404, "WARNING"), (500, "ERROR")]
+
+
+async def test_unhandled_exceptions_are_logged_as_500(records):
+    async with _client(sample_rate=0) as client:
+        with pytest.raises(RuntimeError):
+            await client.get("/boom")
+    
+    [record] = records
+    assert record["extra"]["status"] == 500
+    assert record["level"].name == "ERROR"
+
+
+async def test_request_id_is_reused_and_echoed(records):
+    async with _client(sample_rate=1.0) as client:
+        response = await client.get("/items", headers={REQUEST_ID_HEADER: "abc123"})
+    
+    assert response.headers[REQUEST_ID_HEADER] == "abc123"
+    assert records[0]["extra"]["request_id"] == "abc123"
+
+
+async def test_request_id_is_generated_when_missing(records):
+    async with _client(sample_rate=1.0) as client:
+        first = await client.get("/items")
+        second = await client.get("/items")
+    
+    request_ids = [first.headers[REQUEST_ID_HEADER], second.headers[REQUEST_ID_HEADER]]
+    assert all(len(request_id) == 32 for request_id in request_ids)
+    assert request_ids[0] != request_ids[1]
+    assert [record["extra"]["request_id"] for record in records] == request_ids
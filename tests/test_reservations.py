@@ -0,0 +1,94 @@
+import pytest
+from bson import ObjectId
+from src.repositories import orders as orders_repository
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_create_order_reserves_stock_and_clears_markers(database, create_product, place_order, product):
+    product_id = await create_product("Shirt", quantity=5)
+    
+    response = await place_order(1, (product_id, 3))
+    
+    assert response.status_code == 201
+    stored = await product(product_id)
+    assert stored["sizes"][0]["quantity"] == 2
+    assert stored["total_quantity"] == 2
+    assert stored["reservations"] == []
+    order = await database["orders"].find_one({"_id": ObjectId(response.json()["id"])})
+    assert order["total"] == 30.0
+
+
+async def test_insufficient_stock_rolls_back_every_line(database, create_product, place_order, product):
+    shirt = await create_product("Shirt", quantity=5)
+    hat = await create_product("Hat", quantity=1)
+    
+    response = await place_order(1, (shirt, 2), (hat, 2))
+    
+    assert response.status_code == 400
+    for product_id, quantity in ((shirt, 5), (hat, 1)):
+        stored = await product(product_id)
+        assert stored["sizes"][0]["quantity"] == quantity
+        assert stored["total_quantity"] == quantity
+        assert stored["reservations"] == []
+    assert await database["orders"].count_documents({}) == 0
+
+
+async def test_failed_insert_releases_the_reservation(create_product, place_order, product, monkeypatch):
+    product_id = await create_product("Shirt", quantity=5)
+    
+    async def insert_order(order):
+        raise RuntimeError("write failed")
+    monkeypatch.setattr(orders_repository, "insert_order", insert_order)
+    response = await place_order(1, (product_id, 3))
+    
+    assert response.status_code == 500
+    stored = await product(product_id)
+    assert stored["sizes"][0]["quantity"] == 5
+    assert stored["reservations"] == []
+
+
+async def test_confirm_failure_keeps_the_stored_order(database, create_product, place_order, product, monkeypatch):
+    product_id = await create_product("Shirt", quantity=5)
+    
+    async def confirm_stock(*args):
+        raise RuntimeError("write failed")
+    monkeypatch.setattr(orders_repository, "confirm_stock", confirm_stock)
+    response = await place_order(1, (product_id, 3))
+    
+    assert response.status_code == 201
+    assert await database["orders"].count_documents({}) == 1
+    stored = await product(product_id)
+    assert stored["sizes"][0]["quantity"] == 2
+    assert len(stored["reservations"]) == 1
+
+
+async def test_release_stock_is_idempotent(create_product, product):
+    product_id = ObjectId(await create_product("Shirt", quantity=5))
+    order_id = ObjectId()
+    lines = [(product_id, "md", 3)]
+    assert await orders_repository.reserve_stock(order_id, lines)
+    
+    await orders_repository.release_stock(order_id, lines)
+    await orders_repository.release_stock(order_id, lines)
+    
+    stored = await product(product_id)
+    assert stored["sizes"][0]["quantity"] == 5
+    assert stored["total_quantity"] == 5
+    assert stored["reservations"] == []
+
+
+async def test_stale_reservations_are_confirmed_or_released(database, create_product, product):
+    product_id = ObjectId(await create_product("Shirt", quantity=10))
+    placed, abandoned = ObjectId(), ObjectId()
+    assert await orders_repository.reserve_stock(placed, [(product_id, "md", 2)])
+    assert await orders_repository.reserve_stock(abandoned, [(product_id, "md", 3)])
+    await database["orders"].insert_one({"_id": placed, "userId": 1, "items": [], "total": 20.0})
+    
+    assert await orders_repository.clear_stale_reservations(max_age=3600) == (0, 0)
+    assert await orders_repository.clear_stale_reservations(max_age=-60) == (1, 1)
+    
+    stored = await product(product_id)
+    assert stored["sizes"][0]["quantity"] == 8
+    assert stored["total_quantity"] == 8
+    assert stored["reservations"] == []
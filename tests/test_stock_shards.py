@@ -0,0 +1,46 @@
+import pytest
+from bson import ObjectId
+from src.repositories.products import get_catalog_version
+from src.repositories.stock_shards import rollup_stock
+
+pytestmark = pytest.mark.anyio
+
+
+async def _slots(database, product_id: str) -> list:
+    return await database["stock_shards"].find({"productId": ObjectId(product_id)}).to_list(length=None)
+
+
+async def test_sharded_line_is_split_across_slots(client, database, create_product, place_order):
+    product_id = await create_product("Shirt", quantity=4)
+    response = await client.post(f"/products/{product_id}/stock-shards", json={"shards": 4})
+    assert response.status_code == 200
+    
+    # No single slot holds all three units, so the line takes portions from several
+    assert (await place_order(1, (product_id, 3))).status_code == 201
+    slots = await _slots(database, product_id)
+    assert sum(slot["quantity"] for slot in slots) == 1
+    assert all(slot["reservations"] == [] for slot in slots)
+    
+    # A line larger than the stock left gives back the portions it took
+    assert (await place_order(2, (product_id, 2))).status_code == 400
+    slots = await _slots(database, product_id)
+    assert sum(slot["quantity"] for slot in slots) == 1
+    assert all(slot["reservations"] == [] for slot in slots)
+
+
+async def test_rollup_bumps_the_catalog_version_only_when_a_size_sells_out(client, create_product, place_order, product):
+    product_id = await create_product("Shirt", quantity=4)
+    await client.post(f"/products/{product_id}/stock-shards", json={"shards": 2})
+    
+    assert (await place_order(1, (product_id, 1))).status_code == 201
+    version = await get_catalog_version()
+    assert await rollup_stock() == 1
+    assert (await product(product_id))["total_quantity"] == 3
+    assert await get_catalog_version() == version
+    
+    assert (await place_order(2, (product_id, 3))).status_code == 201
+    assert await rollup_stock() == 1
+    stored = await product(product_id)
+    assert stored["total_quantity"] == 0
+    assert stored["in_stock_sizes"] == []
+    assert await get_catalog_version() == version + 1
@@ -0,0 +1,36 @@
+import pytest
+from src.repositories.orders import rebuild_user_summaries
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_summary_tracks_placed_orders(client, create_product, place_order):
+    product_id = await create_product("Shirt", quantity=10, price=5.0)
+    await place_order(7, (product_id, 1))
+    await place_order(7, (product_id, 2))
+    
+    body = (await client.get("/orders/7/summary")).json()
+    assert (body["userId"], body["order_count"], body["total_spent"]) == (7, 2, 15.0)
+    assert body["last_order_at"] is not None
+    assert (await client.get("/orders/8/summary")).status_code == 404
+
+
+async def test_rebuild_recomputes_summaries(client, database, create_product, place_order):
+    product_id = await create_product("Shirt", quantity=10, price=5.0)
+    await place_order(7, (product_id, 3))
+    await database["user_summaries"].delete_many({})
+    
+    assert await rebuild_user_summaries() == 1
+    body = (await client.get("/orders/7/summary")).json()
+    assert (body["order_count"], body["total_spent"]) == (1, 15.0)
+
+
+async def test_listing_total_comes_from_the_summary_or_a_count(client, database, create_product, place_order):
+    product_id = await create_product("Shirt", quantity=10)
+    for _ in range(3):
+        await place_order(7, (product_id, 1))
+    
+    assert (await client.get("/orders/7", params={"limit": 2})).json()["page"]["total"] == 3
+    await database["user_summaries"].delete_many({})
+    assert (await client.get("/orders/7", params={"limit": 2})).json()["page"]["total"] == 3
+    assert (await client.get("/orders/7", params={"limit": 2, "include_total": False})).json()["page"]["total"] is None